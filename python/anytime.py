@@ -0,0 +1,49 @@
+"""Anytime solving: each improved solution is passed to a callback as soon as
+it is found, and the search stops after a time budget.
+
+The solve functions of the problem modules rely on this module, for example:
+
+    best = elementaryshortestpathwithslots.solve(
+            instance,
+            "iterative_beam_search",
+            time_budget=0.5,
+            on_improvement=lambda incumbent: print(incumbent["cost"]))
+
+An incumbent is a dict with the solution (a route or a list of tours), its
+cost and the time elapsed since the start of the call. A caller running solve
+in another thread or process may use the last incumbent received at any
+moment.
+
+The column generation searches of the vehicle routing modules are in
+columngenerationsearch.py, so that the elementary shortest path modules don't
+import columngenerationsolverpy.
+
+"""
+
+import math
+import time
+
+
+class Incumbents:
+
+    def __init__(self, on_improvement=None, time_budget=math.inf):
+        self.start = time.perf_counter()
+        self.on_improvement = on_improvement
+        self.time_budget = time_budget
+        self.best = None
+
+    def add(self, solution, cost):
+        """Keep the solution if it is better than the best one so far, and
+        pass it to on_improvement."""
+        if self.best is not None and cost >= self.best["cost"]:
+            return False
+        self.best = {
+            "solution": solution,
+            "cost": cost,
+            "time": time.perf_counter() - self.start}
+        if self.on_improvement is not None:
+            self.on_improvement(dict(self.best))
+        return True
+
+    def remaining_time(self):
+        return max(0, self.time_budget - (time.perf_counter() - self.start))
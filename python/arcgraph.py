@@ -0,0 +1,218 @@
+import numpy as np
+
+
+class ArcGraph:
+    """Feasible arcs between visits, in compressed sparse row form.
+
+    A state is the visit of a location during one of its visit intervals,
+    states are numbered by location, then by slot. There is an arc from a
+    state to a visit of another client if it can be reached in time after the
+    end of the first visit. The successors of state a are
+    heads[arc_starts[a]:arc_starts[a + 1]], by increasing state.
+
+    Arcs with the depot, location 0, are not stored: the depot may go to the
+    states of root_heads and every client may go back to the depot.
+
+    """
+
+    def __init__(self, visit_intervals=None, durations=None, from_depot=True, candidates=None, block_size=512):
+        # from_depot: the route leaves the depot at time 0, states which
+        # can't be reached in time are removed with their arcs. Otherwise any
+        # state may start a route.
+        # candidates: if given, only the arcs from each location to its
+        # candidate successors are checked and kept, see
+        # spatialindex.candidate_successors.
+        # Number of arcs between visits of different clients whose time is
+        # checked, None if all of them are.
+        self.number_of_checked_arcs = None
+        if visit_intervals is None:
+            return
+        number_of_locations = len(visit_intervals)
+        number_of_slots = np.array(
+            [len(intervals) for intervals in visit_intervals], dtype=np.int64)
+        self.location_starts = np.concatenate(
+            [[0], np.cumsum(number_of_slots)]).astype(np.int64)
+        number_of_states = int(self.location_starts[-1])
+        self.locations = np.repeat(
+            np.arange(number_of_locations, dtype=np.int64), number_of_slots)
+        self.slots = (
+            np.arange(number_of_states, dtype=np.int64)
+            - self.location_starts[self.locations])
+        intervals = np.array(
+            [interval for intervals in visit_intervals for interval in intervals],
+            dtype=np.int64).reshape(number_of_states, 2)
+        self.starts = intervals[:, 0]
+        self.ends = intervals[:, 1]
+        durations = np.asarray(durations)
+        clients = self.locations != 0
+
+        if candidates is None:
+            counts = self.compute_arcs(durations, clients, block_size)
+            roots = clients
+        else:
+            counts = self.compute_candidate_arcs(
+                durations, number_of_slots, candidates)
+            roots = clients & np.isin(self.locations, candidates[0])
+
+        if from_depot and number_of_states > 0:
+            self.root_heads = np.flatnonzero(
+                roots & (durations[0, self.locations] <= self.starts))
+            # States reached by a path from the depot, the others and their
+            # arcs are removed.
+            reachable = np.zeros(number_of_states, dtype=bool)
+            reachable[self.root_heads] = True
+            while True:
+                reached = reachable.copy()
+                reached[self.heads[np.repeat(reachable, counts)]] = True
+                if np.array_equal(reached, reachable):
+                    break
+                reachable = reached
+            self.heads = self.heads[np.repeat(reachable, counts)]
+            counts[~reachable] = 0
+        else:
+            self.root_heads = np.flatnonzero(roots)
+        self.arc_starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def compute_arcs(self, durations, clients, block_size):
+        # Arcs between all the states, by blocks of tail states. Return the
+        # number of arcs of each state.
+        number_of_states = len(self.locations)
+        counts = np.zeros(number_of_states, dtype=np.int64)
+        heads = []
+        for first in range(0, number_of_states, block_size):
+            last = min(first + block_size, number_of_states)
+            tails = self.locations[first:last]
+            feasible = (
+                self.ends[first:last, np.newaxis]
+                + durations[np.ix_(tails, self.locations)]
+                <= self.starts[np.newaxis, :])
+            feasible &= tails[:, np.newaxis] != self.locations[np.newaxis, :]
+            feasible &= clients[np.newaxis, :]
+            feasible[tails == 0] = False
+            rows, columns = np.nonzero(feasible)
+            counts[first:last] = np.bincount(rows, minlength=last - first)
+            heads.append(columns)
+        self.heads = (
+            np.concatenate(heads).astype(np.int64) if heads
+            else np.zeros(0, dtype=np.int64))
+        return counts
+
+    def compute_candidate_arcs(self, durations, number_of_slots, candidates):
+        # Arcs between the states of the candidate pairs of clients only.
+        # Return the number of arcs of each state.
+        number_of_states = len(self.locations)
+        tail_locations = np.repeat(
+            np.arange(len(candidates), dtype=np.int64),
+            [len(successors) for successors in candidates])
+        head_locations = np.array(
+            [j for successors in candidates for j in successors],
+            dtype=np.int64)
+        kept = (
+            (tail_locations != 0)
+            & (head_locations != 0)
+            & (tail_locations != head_locations))
+        tail_locations = tail_locations[kept]
+        head_locations = head_locations[kept]
+        # Each pair of clients gives the pairs of their states.
+        number_of_tail_slots = number_of_slots[tail_locations]
+        number_of_head_slots = number_of_slots[head_locations]
+        number_of_pairs = number_of_tail_slots * number_of_head_slots
+        pairs = np.repeat(np.arange(len(tail_locations)), number_of_pairs)
+        positions = (
+            np.arange(int(number_of_pairs.sum()), dtype=np.int64)
+            - np.repeat(np.cumsum(number_of_pairs) - number_of_pairs,
+                        number_of_pairs))
+        tails = (
+            self.location_starts[tail_locations[pairs]]
+            + positions // number_of_head_slots[pairs])
+        heads = (
+            self.location_starts[head_locations[pairs]]
+            + positions % number_of_head_slots[pairs])
+        feasible = (
+            self.ends[tails]
+            + durations[tail_locations, head_locations][pairs]
+            <= self.starts[heads])
+        self.number_of_checked_arcs = len(tails)
+        tails = tails[feasible]
+        heads = heads[feasible]
+        order = np.lexsort((heads, tails))
+        self.heads = heads[order]
+        return np.bincount(tails, minlength=number_of_states)
+
+    def number_of_states(self):
+        return len(self.locations)
+
+    def number_of_arcs(self):
+        return len(self.heads)
+
+    def number_of_client_arcs(self):
+        """Number of arcs between visits of different clients."""
+        number_of_slots = np.diff(self.location_starts)[1:]
+        number_of_client_states = int(number_of_slots.sum())
+        return (
+            number_of_client_states * number_of_client_states
+            - int((number_of_slots * number_of_slots).sum()))
+
+    def number_of_candidate_arcs(self):
+        """Number of arcs between visits of different clients whose time is
+        checked, those between candidates if the graph has candidates."""
+        if self.number_of_checked_arcs is None:
+            return self.number_of_client_arcs()
+        return self.number_of_checked_arcs
+
+    def number_of_eliminated_arcs(self):
+        """Number of candidate arcs which are not in the graph, because they
+        are too late or their tail can't be reached from the depot."""
+        return self.number_of_candidate_arcs() - self.number_of_arcs()
+
+    def number_of_filtered_arcs(self):
+        """Number of arcs between visits of different clients which are not
+        candidate arcs."""
+        return self.number_of_client_arcs() - self.number_of_candidate_arcs()
+
+    def tails(self):
+        return np.repeat(
+            np.arange(self.number_of_states(), dtype=np.int64),
+            np.diff(self.arc_starts))
+
+    def with_arcs(self, tails, heads, root_heads):
+        # Graph on the same states with other arcs, sorted by tail and head.
+        graph = ArcGraph()
+        graph.location_starts = self.location_starts
+        graph.locations = self.locations
+        graph.slots = self.slots
+        graph.starts = self.starts
+        graph.ends = self.ends
+        order = np.lexsort((heads, tails))
+        graph.heads = heads[order]
+        graph.arc_starts = np.concatenate([[0], np.cumsum(np.bincount(
+            tails, minlength=self.number_of_states()))]).astype(np.int64)
+        graph.root_heads = np.sort(root_heads)
+        return graph
+
+    def subgraph(self, location_ids):
+        """Return the graph induced by the locations location_ids, which are
+        renumbered by their position in location_ids. location_ids[0] must be
+        the depot."""
+        location_ids = np.asarray(location_ids, dtype=np.int64)
+        kept_states = np.concatenate([
+            np.arange(self.location_starts[location_id],
+                      self.location_starts[location_id + 1])
+            for location_id in location_ids.tolist()]).astype(np.int64)
+        new_states = np.full(self.number_of_states(), -1, dtype=np.int64)
+        new_states[kept_states] = np.arange(len(kept_states))
+        graph = ArcGraph()
+        graph.locations = np.repeat(
+            np.arange(len(location_ids), dtype=np.int64),
+            np.diff(self.location_starts)[location_ids])
+        graph.location_starts = np.concatenate([[0], np.cumsum(
+            np.diff(self.location_starts)[location_ids])]).astype(np.int64)
+        graph.slots = self.slots[kept_states]
+        graph.starts = self.starts[kept_states]
+        graph.ends = self.ends[kept_states]
+        tails = new_states[self.tails()]
+        heads = new_states[self.heads]
+        kept_arcs = (tails >= 0) & (heads >= 0)
+        root_heads = new_states[self.root_heads]
+        return graph.with_arcs(
+            tails[kept_arcs], heads[kept_arcs], root_heads[root_heads >= 0])
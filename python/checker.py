@@ -0,0 +1,238 @@
+"""Check the certificates of results/ in bulk.
+
+Each instance is loaded once for all the certificates which refer to it and
+the durations of a route are looked up with a single indexing of the duration
+matrix, or computed from the coordinates of their ends if the matrix isn't
+stored with the instance. NumPy is then not imported. Results are returned as dicts instead of being printed, the rules are
+those of the Instance.check methods of the solvers.
+
+Usage: python checker.py [-r ../results] [-d ../data] [-w 4] [-o checks.json]
+
+"""
+
+import json
+import math
+import os
+import instancefile
+
+# Data directory of each results directory, whether it contains routes of
+# vehicles or a single path and whether only the first visit interval of the
+# locations may be used.
+RESULTS = {
+        "dynamicprogramming": (
+            "elementaryshortestpathwithslots", False, True),
+        "treesearch": (
+            "elementaryshortestpathwithslots", False, False),
+        "columnsdynamicprogramming": (
+            "vehicleroutingwithslots", True, True),
+        "columnstreesearch": (
+            "vehicleroutingwithslots", True, False)}
+
+
+class Instance:
+
+    def __init__(self, filepath):
+        data, durations = instancefile.read(filepath)
+        self.visit_intervals = data["visit_intervals"]
+        number_of_locations = len(self.visit_intervals)
+        self.values = data.get("values", [0] * number_of_locations)
+        self.xs = data["xs"]
+        self.ys = data["ys"]
+        self.durations = durations
+        # Intervals of each location sorted by end, the earliest ending one
+        # which can still be reached is the one visited.
+        self.sorted_visit_intervals = [
+                sorted(intervals, key=lambda interval: interval[1])
+                for intervals in self.visit_intervals]
+
+    def arc_durations(self, origins, destinations):
+        if self.durations is not None:
+            return self.durations[origins, destinations].tolist()
+        return [instancefile.compute_duration(
+                    self.xs[i], self.ys[i], self.xs[j], self.ys[j])
+                for i, j in zip(origins, destinations)]
+
+    def route_on_time(self, route, durations, single_slot):
+        # durations[k] is the duration of the arc reaching route[k].
+        current_time = None
+        for location_id, duration in zip(route, durations):
+            intervals = (
+                    self.visit_intervals[location_id][:1] if single_slot
+                    else self.sorted_visit_intervals[location_id])
+            if current_time is None:
+                # The first location is always reached on time.
+                time = -math.inf
+            else:
+                time = current_time + duration
+            for interval in intervals:
+                if time <= interval[0]:
+                    current_time = interval[1]
+                    break
+            else:
+                return False
+        return True
+
+
+def check_certificate(instance, data, vehicle_routing, single_slot):
+    number_of_locations = len(instance.visit_intervals)
+    if vehicle_routing:
+        routes = [route for route in data["locations"] if route != []]
+    elif data["locations"] != [] or (
+            not single_slot and number_of_locations > 0):
+        # With several slots, the path is closed at the depot even if it is
+        # empty.
+        routes = [data["locations"]]
+    else:
+        routes = []
+    visited = [location_id for route in routes for location_id in route]
+    if any(not (0 <= location_id < number_of_locations)
+           for location_id in visited):
+        return {"feasible": False, "error": "unknown location"}
+
+    # Arcs of all routes, from and back to the depot.
+    origins = [
+            location_id for route in routes for location_id in [0] + route]
+    destinations = [
+            location_id for route in routes for location_id in route + [0]]
+    durations = instance.arc_durations(origins, destinations)
+    travelled_distance = sum(durations)
+    on_time = True
+    start = 0
+    for route in routes:
+        if not instance.route_on_time(
+                route,
+                durations[start:start + len(route)],
+                single_slot):
+            on_time = False
+            break
+        start += len(route) + 1
+
+    number_of_duplicates = len(visited) - len(set(visited))
+    result = {
+            "feasible": (
+                number_of_duplicates == 0
+                and on_time
+                and 0 not in visited),
+            "number_of_duplicates": number_of_duplicates,
+            "on_time": on_time}
+    if vehicle_routing:
+        result["objective"] = travelled_distance
+        result["number_of_vehicles"] = len(routes)
+        result["number_of_unvisited_locations"] = (
+                number_of_locations - 1 - len(set(visited) - {0}))
+    else:
+        result["objective"] = travelled_distance - sum(
+                instance.values[location_id] for location_id in destinations)
+    return result
+
+
+def check_instance(data_path, certificates):
+    """Check the certificates [(result type, certificate path)] of the
+    instance data_path."""
+    instance = Instance(data_path)
+    results = []
+    for result_type, certificate_path in certificates:
+        _, vehicle_routing, single_slot = RESULTS[result_type]
+        try:
+            with open(certificate_path) as json_file:
+                data = json.load(json_file)
+        except (OSError, ValueError) as error:
+            results.append({"feasible": False, "error": str(error)})
+            continue
+        results.append(check_certificate(
+                instance, data, vehicle_routing, single_slot))
+    return results
+
+
+def check_results(
+        results_path,
+        data_path,
+        result_types=None,
+        number_of_workers=1):
+    """Check all the certificates of results_path.
+
+    Return a dict {result type: {certificate name: result}}.
+
+    """
+    if result_types is None:
+        result_types = list(RESULTS)
+    instances = {}
+    for result_type in result_types:
+        data_type = RESULTS[result_type][0]
+        directory = os.path.join(results_path, result_type)
+        for name in sorted(os.listdir(directory)):
+            if not name.startswith("instance_") or not name.endswith(".json"):
+                continue
+            instance_path = os.path.join(data_path, data_type, name)
+            if not os.path.exists(instance_path):
+                # Instance in the binary format.
+                instance_path = instance_path[:-len(".json")]
+            instances.setdefault(instance_path, []).append(
+                    (result_type, os.path.join(directory, name)))
+
+    tasks = list(instances.items())
+    if number_of_workers > 1:
+        import multiprocessing
+        with multiprocessing.Pool(number_of_workers) as pool:
+            outputs = pool.starmap(check_instance, tasks, chunksize=8)
+    else:
+        outputs = [check_instance(*task) for task in tasks]
+
+    results = {result_type: {} for result_type in result_types}
+    for (_, certificates), output in zip(tasks, outputs):
+        for (result_type, certificate_path), result in zip(
+                certificates, output):
+            name = os.path.basename(certificate_path)
+            results[result_type][name] = result
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-r", "--results",
+            type=str,
+            default=os.path.join("..", "results"),
+            help='')
+    parser.add_argument(
+            "-d", "--data",
+            type=str,
+            default=os.path.join("..", "data"),
+            help='')
+    parser.add_argument(
+            "-t", "--types",
+            type=str,
+            nargs="+",
+            choices=list(RESULTS),
+            default=list(RESULTS),
+            help='')
+    parser.add_argument(
+            "-w", "--number-of-workers",
+            type=int,
+            default=1,
+            help='')
+    parser.add_argument(
+            "-o", "--output",
+            type=str,
+            default=None,
+            help='file where the results of the checks are written')
+
+    args = parser.parse_args()
+
+    results = check_results(
+            args.results, args.data, args.types, args.number_of_workers)
+    for result_type, type_results in results.items():
+        infeasible = [name for name, result in type_results.items()
+                      if not result["feasible"]]
+        total = sum(result.get("objective", 0)
+                    for result in type_results.values())
+        print(f"{result_type:<28}"
+              f"certificates: {len(type_results):<6}"
+              f"infeasible: {len(infeasible):<6}"
+              f"total objective: {total}")
+        for name in infeasible:
+            print(f"    {name}: {type_results[name]}")
+    if args.output is not None:
+        with open(args.output, 'w') as json_file:
+            json.dump(results, json_file, indent=4)
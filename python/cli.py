@@ -0,0 +1,70 @@
+"""Single entry point for the programs of this directory.
+
+The module of the command is only imported once it is selected, then run with
+the remaining arguments as if it had been launched directly. Commands which
+don't solve, like checker and generator, don't import the solvers and their
+dependencies.
+
+Usage: python cli.py ts -a label_setting -i ../data/elementaryshortestpathwithslots/instance_10.json
+       python cli.py checker -t treesearch
+       python cli.py generator -o ../data/large/instance -n 1000
+
+Startup times are measured by scripts/benchmark.py.
+
+"""
+
+import argparse
+import runpy
+import sys
+
+# Module and description of each command.
+COMMANDS = {
+        "dp": (
+            "elementaryshortestpathwithsingleslot",
+            "elementary shortest path, dynamic programming"),
+        "ts": (
+            "elementaryshortestpathwithslots",
+            "elementary shortest path with slots, tree search"),
+        "cgdp": (
+            "vehicleroutingwithsingleslot",
+            "vehicle routing, column generation with dynamic programming"),
+        "cgts": (
+            "vehicleroutingwithslots",
+            "vehicle routing with slots, column generation with tree search"),
+        "checker": (
+            "checker",
+            "check the certificates of results/"),
+        "generator": (
+            "instancegenerator",
+            "generate instances"),
+        "service": (
+            "solverservice",
+            "resident solver service")}
+
+
+def run(command, arguments):
+    module_name = COMMANDS[command][0]
+    sys.argv = [module_name + ".py"] + arguments
+    runpy.run_module(module_name, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+            description='',
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+            epilog="commands:\n" + "\n".join(
+                f"  {command:<12}{description}"
+                for command, (_, description) in COMMANDS.items()))
+    parser.add_argument(
+            "command",
+            choices=list(COMMANDS),
+            metavar="command",
+            help='see below, "<command> --help" lists its arguments')
+    parser.add_argument(
+            "arguments",
+            nargs=argparse.REMAINDER,
+            help='')
+
+    args = parser.parse_args()
+
+    run(args.command, args.arguments)
@@ -0,0 +1,67 @@
+"""Anytime column generation searches, see anytime.py."""
+
+import treesearchsolverpy
+from columngenerationsolverpy import TOL
+from columngenerationsolverpy.branching_scheme import BranchingScheme
+
+
+class ColumnGenerationBranchingScheme(BranchingScheme):
+    """Branching scheme of columngenerationsolverpy reporting each improved
+    feasible node to the incumbents, with its columns converted by
+    to_solution."""
+
+    def __init__(self, parameters, incumbents, to_solution, **kwargs):
+        super().__init__(parameters, **kwargs)
+        self.incumbents = incumbents
+        self.to_solution = to_solution
+        # Nodes are only pruned by the best solution value in the limited
+        # discrepancy search, as in columngenerationsolverpy.
+        self.update_bound = kwargs.get("update_bound", False)
+
+    def next_child(self, father):
+        child = super().next_child(father)
+        if child is None or not child.is_feasible:
+            return child
+        best = self.incumbents.best
+        if best is not None and child.solution_value >= best["cost"] - TOL:
+            return child
+        # Pairs of columns and values, as in the output of
+        # columngenerationsolverpy.
+        fixed_columns = []
+        node = child
+        while node.father is not None:
+            if node.column_value != 0:
+                fixed_columns.append((
+                    self.parameters.columns[node.column_id],
+                    node.column_value))
+            node = node.father
+        self.incumbents.add(
+            self.to_solution(self.parameters.columns, fixed_columns),
+            child.solution_value)
+        if self.update_bound:
+            self.output["solution_value"] = child.solution_value
+        return child
+
+
+def column_generation_search(parameters, algorithm, incumbents, to_solution):
+    """Run the greedy or the limited discrepancy search of
+    columngenerationsolverpy. A node is only interrupted by the time budget
+    once its column generation is over."""
+    if algorithm == "greedy":
+        branching_scheme = ColumnGenerationBranchingScheme(
+            parameters, incumbents, to_solution, verbose=False)
+        treesearchsolverpy.greedy(
+            branching_scheme,
+            time_limit=incumbents.remaining_time(),
+            verbose=False)
+    elif algorithm == "limited_discrepancy_search":
+        branching_scheme = ColumnGenerationBranchingScheme(
+            parameters, incumbents, to_solution,
+            verbose=False, update_bound=True)
+        treesearchsolverpy.best_first_search(
+            branching_scheme,
+            time_limit=incumbents.remaining_time(),
+            verbose=False)
+    else:
+        raise ValueError(f"Unknown algorithm: {algorithm}.")
+    return incumbents.best
@@ -0,0 +1,107 @@
+import json
+import time
+import numpy as np
+
+
+class ColumnGenerationTrace:
+    """Writes one JSON line per iteration of column generation.
+
+    The trace is filled by the pricing solvers, which only see the duals of
+    the master problem. Its objective is recovered by duality: the cost of the
+    fixed columns, the duals weighted by the bounds of the remaining rows and
+    the negative reduced costs of the columns at their upper bound.
+
+    """
+
+    def __init__(self, filepath, dummy_column_objective_coefficient):
+        self.file = open(filepath, 'w')
+        self.dummy_column_objective_coefficient = dummy_column_objective_coefficient
+        self.column_generation = -1
+        self.iteration = 0
+        self.start = None
+        self.fixed_cost = 0
+        self.number_of_fixed_vehicles = 0
+        # Pool of the pricing solver and state of the current iteration.
+        self.column_pool = None
+        self.forbidden_rows = None
+        self.duals = None
+        self.master_columns = None
+        self.master_objective = None
+        self.pricing_start = None
+
+    def initialize(self, columns, fixed_columns):
+        # Called from initialize_pricing, at the start of each column
+        # generation.
+        self.column_generation += 1
+        self.iteration = 0
+        self.start = time.time()
+        self.fixed_cost = sum(
+            columns[column_id].objective_coefficient
+            for column_id, _ in fixed_columns)
+        self.number_of_fixed_vehicles = sum(
+            column_value for _, column_value in fixed_columns)
+
+    def start_iteration(self, duals, column_pool, forbidden_rows):
+        # Called before pricing, the pool then holds the columns of the
+        # master problem.
+        self.pricing_start = time.time()
+        self.column_pool = column_pool
+        self.forbidden_rows = forbidden_rows
+        self.duals = np.asarray(duals, dtype=float)
+        self.master_columns = np.zeros(0, dtype=bool)
+        master_reduced_costs = np.zeros(0)
+        if column_pool.columns != []:
+            self.master_columns = (
+                np.array(column_pool.added)
+                & ~column_pool.forbidden(forbidden_rows))
+            master_reduced_costs = column_pool.reduced_costs(
+                duals)[self.master_columns]
+
+        # Rows of the clients which are not fixed yet are equal to 1, the
+        # others are removed from the master problem and their dual is 0.
+        # Row 0 is between 0 and the number of vehicles left.
+        dual = self.duals[0]
+        number_of_vehicles = len(self.duals) - 1
+        row_0_bound = (
+            (0 if dual > 0 else number_of_vehicles)
+            - self.number_of_fixed_vehicles)
+        client_duals = self.duals[1:][~np.asarray(forbidden_rows)[1:]]
+        # Columns, including the dummy column of each client row, are at
+        # most 1.
+        self.master_objective = float(
+            self.fixed_cost
+            + dual * row_0_bound
+            + client_duals.sum()
+            + np.minimum(master_reduced_costs, 0).sum()
+            + np.minimum(
+                self.dummy_column_objective_coefficient - client_duals,
+                0).sum())
+        self.number_of_columns = int(self.master_columns.sum())
+
+    def end_iteration(self, subproblem_size, number_of_columns_added):
+        pricing_time = time.time() - self.pricing_start
+        # Best reduced cost among the columns which were not in the master
+        # problem, including those found by this pricing.
+        best_reduced_cost = None
+        column_pool = self.column_pool
+        if column_pool.columns != []:
+            candidates = ~column_pool.forbidden(self.forbidden_rows)
+            candidates[:len(self.master_columns)] &= ~self.master_columns
+            reduced_costs = column_pool.reduced_costs(self.duals)[candidates]
+            if len(reduced_costs) > 0:
+                best_reduced_cost = float(reduced_costs.min())
+        self.file.write(json.dumps({
+            "column_generation": self.column_generation,
+            "iteration": self.iteration,
+            "time": time.time() - self.start,
+            "master_objective": self.master_objective,
+            "number_of_columns": self.number_of_columns,
+            "best_reduced_cost": best_reduced_cost,
+            "pricing_time": pricing_time,
+            "subproblem_size": subproblem_size,
+            "number_of_columns_added": number_of_columns_added}) + "\n")
+        self.file.flush()
+        self.iteration += 1
+
+    def close(self):
+        self.file.close()
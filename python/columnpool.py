@@ -0,0 +1,80 @@
+import numpy as np
+import columngenerationsolverpy
+
+
+class ColumnPool:
+    """Routes found by the pricing solvers, keyed by their sequence of
+    locations.
+
+    The rows of the columns are stored in compressed sparse form so that all
+    reduced costs are computed with a single vectorized product.
+
+    """
+
+    def __init__(self):
+        self.columns = []
+        self.routes = {}
+        # True once the column has been given to the master problem.
+        self.added = []
+        self.row_indices = []
+        self.row_coefficients = []
+        self.row_starts = []
+        self.objective_coefficients = []
+        self.arrays = None
+
+    def add(self, column):
+        """Add a column to the pool unless its route is already there."""
+        route = tuple(column.extra)
+        if route == () or route in self.routes:
+            return False
+        self.routes[route] = len(self.columns)
+        self.columns.append(column)
+        self.added.append(False)
+        self.row_starts.append(len(self.row_indices))
+        self.row_indices += column.row_indices
+        self.row_coefficients += column.row_coefficients
+        self.objective_coefficients.append(column.objective_coefficient)
+        self.arrays = None
+        return True
+
+    def compute_arrays(self):
+        if self.arrays is None:
+            self.arrays = (
+                np.array(self.row_indices),
+                np.array(self.row_coefficients, dtype=float),
+                np.array(self.row_starts),
+                np.array(self.objective_coefficients, dtype=float))
+        return self.arrays
+
+    def reduced_costs(self, duals):
+        row_indices, row_coefficients, row_starts, objective = self.compute_arrays()
+        duals = np.asarray(duals, dtype=float)
+        return objective - np.add.reduceat(
+            duals[row_indices] * row_coefficients, row_starts)
+
+    def forbidden(self, forbidden_rows):
+        """Return whether each column covers one of the forbidden rows."""
+        row_indices, _, row_starts, _ = self.compute_arrays()
+        return np.add.reduceat(
+            np.asarray(forbidden_rows, dtype=int)[row_indices], row_starts) > 0
+
+    def negative_columns(self, duals, forbidden_rows, maximum_number_of_columns):
+        """Return the ids of the best columns with a negative reduced cost
+        which have not been given to the master problem yet and do not cover
+        any of the forbidden rows."""
+        if self.columns == []:
+            return []
+        reduced_costs = self.reduced_costs(duals)
+        candidates = np.flatnonzero(
+            (reduced_costs <= -columngenerationsolverpy.TOL)
+            & ~self.forbidden(forbidden_rows)
+            & ~np.array(self.added))
+        candidates = candidates[np.argsort(
+            reduced_costs[candidates], kind="stable")]
+        return candidates[:maximum_number_of_columns].tolist()
+
+    def use(self, column_ids):
+        """Mark columns as given to the master problem and return them."""
+        for column_id in column_ids:
+            self.added[column_id] = True
+        return [self.columns[column_id] for column_id in column_ids]
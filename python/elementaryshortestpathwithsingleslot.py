@@ -1,8 +1,8 @@
 import json
 import math
-from operator import attrgetter, le
-from re import DEBUG
-import numpy as np
+import time
+import anytime
+import instancefile
 
 INF = 9999999
 
@@ -20,16 +20,24 @@ class Instance:
 
     def __init__(self, filepath=None):
         self.locations = []
+        self.durations = None
+        self.values = None
+        self.duration_table = None
+        self.cost_table = None
+        self.graph = None
         if filepath is not None:
-            with open(filepath) as json_file:
-                data = json.load(json_file)
-                locations = zip(
-                    data["visit_intervals"],
-                    data["xs"],
-                    data["ys"],
-                    data["values"])
-                for (intervals, x, y, value) in locations:
-                    self.add_location(intervals[0], x, y, value)
+            # JSON file or directory of the binary format.
+            data, durations = instancefile.read(filepath)
+            locations = zip(
+                data["visit_intervals"],
+                data["xs"],
+                data["ys"],
+                data["values"])
+            for (intervals, x, y, value) in locations:
+                self.add_location(intervals[0], x, y, value)
+            # A stored matrix is used, otherwise it is built at first use.
+            if durations is not None:
+                self.compute_matrices(durations)
 
     def add_location(self, visit_interval, x, y, value):
         location = Location()
@@ -39,18 +47,108 @@ class Instance:
         location.y = y
         location.value = value
         self.locations.append(location)
+        # Matrices are rebuilt lazily once the instance is complete.
+        self.durations = None
+        self.duration_table = None
+        self.cost_table = None
+        self.graph = None
+
+    def compute_matrices(self, durations=None):
+        # durations may be given when they are already known, for example
+        # when the instance is a subset of a larger one or when they are
+        # stored with it.
+        if durations is None:
+            durations = instancefile.compute_durations(
+                [location.x for location in self.locations],
+                [location.y for location in self.locations])
+        self.durations = durations
+        self.duration_table = None
+        self.graph = None
+        self.set_values([location.value for location in self.locations])
+
+    def set_values(self, values):
+        import numpy as np
+        # Only the costs depend on the values, the durations are kept. The
+        # cost of going from i to j is durations[i, j] - values[j].
+        if self.durations is None:
+            self.compute_matrices()
+        self.values = np.asarray(values)
+        for location, value in zip(self.locations, self.values.tolist()):
+            location.value = value
+        self.cost_table = None
+
+    def compute_tables(self):
+        import numpy as np
+        # Plain lists are faster than NumPy scalar indexing in Python loops,
+        # they are built at the first access. Return False if the instance is
+        # too large for them, see instancefile.
+        if self.durations is None:
+            self.compute_matrices()
+        if (len(self.locations)
+                > instancefile.MAXIMUM_NUMBER_OF_LOCATIONS_OF_TABLES):
+            return False
+        if self.duration_table is None:
+            self.duration_table = self.durations.tolist()
+        if self.cost_table is None:
+            self.cost_table = (
+                self.durations - self.values[np.newaxis, :]).tolist()
+        return True
+
+    def compute_graph(self):
+        from arcgraph import ArcGraph
+        # Feasible arcs between clients, computed once for all the calls on
+        # the instance. Routes may start at any client, the time at the depot
+        # is not checked.
+        if self.durations is None:
+            self.compute_matrices()
+        self.set_graph(ArcGraph(
+            [[location.visit_interval] for location in self.locations],
+            self.durations,
+            from_depot=False))
+
+    def candidate_graph(self, candidates):
+        from arcgraph import ArcGraph
+        # Feasible arcs from each client to its candidate successors only,
+        # for one call, the other arcs are never built.
+        if self.durations is None:
+            self.compute_matrices()
+        return ArcGraph(
+            [[location.visit_interval] for location in self.locations],
+            self.durations,
+            from_depot=False,
+            candidates=candidates)
+
+    def set_graph(self, graph):
+        # graph may also come from a larger instance, see ArcGraph.subgraph.
+        self.graph = graph
+        self.successors, self.order, self.predecessors = graph_lists(graph)
 
     def duration(self, location_id_1, location_id_2):
-        xd = self.locations[location_id_2].x - self.locations[location_id_1].x
-        yd = self.locations[location_id_2].y - self.locations[location_id_1].y
-        d = round(math.sqrt(xd * xd + yd * yd))
-        return d
+        if self.durations is None:
+            # Durations are computed one at a time until the matrix is
+            # needed, checking a certificate only reads a few of them.
+            location_1 = self.locations[location_id_1]
+            location_2 = self.locations[location_id_2]
+            return instancefile.compute_duration(
+                location_1.x, location_1.y, location_2.x, location_2.y)
+        if self.duration_table is None and not self.compute_tables():
+            return int(self.durations[location_id_1, location_id_2])
+        return self.duration_table[location_id_1][location_id_2]
 
     def cost(self, location_id_1, location_id_2):
-        xd = self.locations[location_id_2].x - self.locations[location_id_1].x
-        yd = self.locations[location_id_2].y - self.locations[location_id_1].y
-        d = round(math.sqrt(xd * xd + yd * yd))
-        return d - self.locations[location_id_2].value
+        if self.durations is None:
+            return (self.duration(location_id_1, location_id_2)
+                    - self.locations[location_id_2].value)
+        if self.cost_table is None and not self.compute_tables():
+            return (self.durations[location_id_1, location_id_2]
+                    - self.values[location_id_2]).item()
+        return self.cost_table[location_id_1][location_id_2]
+
+    def cost_row(self, location_id):
+        # Costs from location_id to each location.
+        if self.cost_table is None and not self.compute_tables():
+            return (self.durations[location_id] - self.values).tolist()
+        return self.cost_table[location_id]
 
     def write(self, filepath):
         data = {"visit_intervals": [location.visit_intervals
@@ -102,31 +200,54 @@ class Instance:
                 max = location.get_end()
         return max
 
-def dynamic_programming(instance:Instance):
+def dynamic_programming(instance:Instance, statistics=None, candidates=None):
+    # statistics, if given, is a dict filled with the number of rounds of the
+    # fixed-point loop, of relaxed arcs and of labels created
+    # candidates, if given, lists the clients which may follow each location,
+    # see spatialindex.candidate_successors
     listClient = [v for v in instance.locations][1:]
     nbClient = len(listClient)
     if (nbClient == 0):
         return []
+    if candidates is None:
+        if instance.graph is None:
+            instance.compute_graph()
+        successors = instance.successors
+    else:
+        successors, _, _ = graph_lists(instance.candidate_graph(candidates))
+    # clients are numbered from 0 in the loops below
+    successors = [[j - 1 for j in successors[i + 1]] for i in range(nbClient)]
     # TODO START
     min_path_values = [instance.cost(0, i+1) for i in range (nbClient)]
     predecessor = [None for _ in range(nbClient)]
-    visited_clients = [{} for _ in range(nbClient)]
+    # visited sets are bitmasks: bit i is set iff client i is on the path
+    visited_clients = [0 for _ in range(nbClient)]
     previous_visited_clients = [v for v in visited_clients]
     previous_values = [v for v in min_path_values]
+    number_of_rounds = 0
+    number_of_labels = nbClient
 
     # computing minimal path from depot for all clients
     # if values doesn't change, finished. |V|-1 iteration at most
     while(True): 
+        number_of_rounds += 1
         previous_values = [v for v in min_path_values]
         previous_visited_clients = [v for v in visited_clients]
         for i in range(nbClient):
-            for j in range(nbClient):
-                if feasible_and_improve(i, j, instance, previous_values, min_path_values, previous_visited_clients):
+            for j in successors[i]:
+                # arcs of the graph are feasible
+                if improve(i, j, instance, previous_values, min_path_values, previous_visited_clients):
                     predecessor[j] = i
                     min_path_values[j] =  previous_values[i] + instance.cost(i+1, j+1)
-                    visited_clients[j] = {i}.union(previous_visited_clients[i])
+                    visited_clients[j] = (1 << i) | previous_visited_clients[i]
+                    number_of_labels += 1
         if min_path_values == previous_values:
             break
+    if statistics is not None:
+        statistics["rounds"] = number_of_rounds
+        statistics["relaxations"] = number_of_rounds * sum(
+            len(client_successors) for client_successors in successors)
+        statistics["labels"] = number_of_labels
     # then pick best cycle by adding the edge (u, depot) to the shortest path (depot, u)
     best_path_end = min([(i, min_path_values[i] + instance.cost(i+1, 0)) for i in range(nbClient)], key= lambda a : a[1])
     current = best_path_end[0]
@@ -139,11 +260,107 @@ def dynamic_programming(instance:Instance):
     # TODO END
     return res
 
-def feasible_and_improve(i, j, instance, old_values, new_values, visited):
-    feasible = i != j and instance.locations[i+1].visit_interval[1] + instance.duration(i+1, j+1) <= instance.locations[j+1].visit_interval[0]
-    elementary = not j in visited[i]
+def topological_dynamic_programming(instance:Instance, statistics=None, candidates=None):
+    routes = topological_dynamic_programming_routes(
+        instance, 1, statistics, candidates)
+    if routes == []:
+        return []
+    return routes[0]
+
+def topological_dynamic_programming_routes(instance:Instance, number_of_routes, statistics=None, candidates=None):
+    # returns the best routes ending at different clients, best first
+    nbClient = len(instance.locations) - 1
+    if (nbClient <= 0):
+        return []
+    cost = instance.cost
+
+    # an arc (i, j) requires end_i + d(i, j) <= start_j, so ordering clients by
+    # window makes the graph acyclic and each arc is relaxed exactly once
+    if candidates is None:
+        if instance.graph is None:
+            instance.compute_graph()
+        order, predecessors = instance.order, instance.predecessors
+    else:
+        _, order, predecessors = graph_lists(
+            instance.candidate_graph(candidates))
+    min_path_values = [None for _ in range(nbClient + 1)]
+    predecessor = [None for _ in range(nbClient + 1)]
+    number_of_relaxations = 0
+    number_of_labels = nbClient
+    for position, j in enumerate(order):
+        best_value = cost(0, j)
+        best_predecessor = None
+        for i in predecessors[j]:
+            number_of_relaxations += 1
+            value = min_path_values[i] + cost(i, j)
+            if value < best_value:
+                best_value = value
+                best_predecessor = i
+                number_of_labels += 1
+        min_path_values[j] = best_value
+        predecessor[j] = best_predecessor
+    if statistics is not None:
+        statistics["rounds"] = 1
+        statistics["relaxations"] = number_of_relaxations
+        statistics["labels"] = number_of_labels
+
+    # then pick best cycles by adding the edge (u, depot) to the shortest path (depot, u)
+    ends = sorted(range(1, nbClient + 1),
+                  key=lambda i: min_path_values[i] + cost(i, 0))
+    routes = []
+    for current in ends[:number_of_routes]:
+        res = []
+        while current != None:
+            res.append(current)
+            current = predecessor[current]
+        res.reverse()
+        routes.append(res)
+    return routes
+
+def graph_lists(graph):
+    import numpy as np
+    # successors[i]: clients which may follow location i
+    # order: clients by visit interval, predecessors[j]: clients which may
+    # precede client j and come before it in order, in this order
+    successors = [[] for _ in range(graph.number_of_states())]
+    tails = graph.tails()
+    heads = graph.heads
+    for i, j in zip(tails.tolist(), heads.tolist()):
+        successors[i].append(j)
+    clients = np.flatnonzero(graph.locations != 0)
+    order = clients[np.lexsort(
+        (clients, graph.ends[clients], graph.starts[clients]))]
+    positions = np.zeros(graph.number_of_states(), dtype=np.int64)
+    positions[order] = np.arange(len(order))
+    forward = positions[tails] < positions[heads]
+    tails, heads = tails[forward], heads[forward]
+    arcs = np.lexsort((positions[tails], positions[heads]))
+    predecessors = [[] for _ in range(graph.number_of_states())]
+    for i, j in zip(tails[arcs].tolist(), heads[arcs].tolist()):
+        predecessors[j].append(i)
+    return successors, order.tolist(), predecessors
+
+def improve(i, j, instance, old_values, new_values, visited):
+    elementary = (visited[i] >> j) & 1 == 0
     improved = old_values[i] + instance.cost(i+1, j+1) < new_values[j]
-    return feasible and elementary and improved
+    return elementary and improved
+
+def solve(instance, algorithm="topological_dynamic_programming", time_budget=math.inf, on_improvement=None, candidates=None):
+    # same interface as elementaryshortestpathwithslots.solve, the dynamic
+    # programs are not interrupted, their route is the only incumbent after
+    # the empty route
+    incumbents = anytime.Incumbents(on_improvement, time_budget)
+    incumbents.add([], 0)
+    if algorithm == "dynamic_programming":
+        route = dynamic_programming(instance, candidates=candidates)
+    elif algorithm == "topological_dynamic_programming":
+        route = topological_dynamic_programming(instance, candidates=candidates)
+    else:
+        raise ValueError(f"Unknown algorithm: {algorithm}.")
+    if route != []:
+        locations = [0] + route + [0]
+        incumbents.add(route, sum(instance.cost(i, j) for i, j in zip(locations, locations[1:])))
+    return incumbents.best
 
 if __name__ == "__main__":
     import argparse
@@ -162,12 +379,37 @@ if __name__ == "__main__":
         type=str,
         default=None,
         help='')
+    parser.add_argument(
+        "-s", "--statistics",
+        type=str,
+        default=None,
+        help='file where the statistics of the algorithm are written')
+    parser.add_argument(
+        "--number-of-candidates",
+        type=int,
+        default=None,
+        help='number of nearest clients which may follow each client')
 
     args = parser.parse_args()
 
-    if args.algorithm == "dynamic_programming":
+    if args.algorithm in ["dynamic_programming", "topological_dynamic_programming"]:
         instance = Instance(args.instance)
-        solution = dynamic_programming(instance)
+        statistics = {}
+        start = time.perf_counter()
+        candidates = None
+        if args.number_of_candidates is not None:
+            import spatialindex
+            candidates = spatialindex.candidate_successors(
+                instance.locations, args.number_of_candidates)
+        if args.algorithm == "dynamic_programming":
+            solution = dynamic_programming(instance, statistics, candidates)
+        else:
+            solution = topological_dynamic_programming(
+                instance, statistics, candidates)
+        statistics["time"] = time.perf_counter() - start
+        if args.statistics is not None:
+            with open(args.statistics, 'w') as json_file:
+                json.dump(statistics, json_file, indent=4)
         if args.certificate is not None:
             data = {"locations": solution}
             with open(args.certificate, 'w') as json_file:
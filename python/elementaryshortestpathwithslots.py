@@ -1,8 +1,11 @@
+import heapq
 import json
 import math
-from sortedcontainers.sortedlist import add
-import treesearchsolverpy
+import time
+import anytime
+import instancefile
 from functools import total_ordering
+from itertools import groupby
 
 
 class Location:
@@ -17,16 +20,24 @@ class Instance:
 
     def __init__(self, filepath=None):
         self.locations = []
+        self.durations = None
+        self.values = None
+        self.duration_table = None
+        self.cost_table = None
+        self.graph = None
         if filepath is not None:
-            with open(filepath) as json_file:
-                data = json.load(json_file)
-                locations = zip(
-                    data["visit_intervals"],
-                    data["xs"],
-                    data["ys"],
-                    data["values"])
-                for (intervals, x, y, value) in locations:
-                    self.add_location(intervals, x, y, value)
+            # JSON file or directory of the binary format.
+            data, durations = instancefile.read(filepath)
+            locations = zip(
+                data["visit_intervals"],
+                data["xs"],
+                data["ys"],
+                data["values"])
+            for (intervals, x, y, value) in locations:
+                self.add_location(intervals, x, y, value)
+            # A stored matrix is used, otherwise it is built at first use.
+            if durations is not None:
+                self.compute_matrices(durations)
 
     def add_location(self, visit_intervals, x, y, value):
         location = Location()
@@ -36,18 +47,101 @@ class Instance:
         location.y = y
         location.value = value
         self.locations.append(location)
+        # Matrices are rebuilt lazily once the instance is complete.
+        self.durations = None
+        self.duration_table = None
+        self.cost_table = None
+        self.graph = None
+
+    def compute_matrices(self, durations=None):
+        # durations may be given when they are already known, for example
+        # when the instance is a subset of a larger one or when they are
+        # stored with it.
+        if durations is None:
+            durations = instancefile.compute_durations(
+                [location.x for location in self.locations],
+                [location.y for location in self.locations])
+        self.durations = durations
+        self.duration_table = None
+        self.graph = None
+        self.set_values([location.value for location in self.locations])
+
+    def set_values(self, values):
+        import numpy as np
+        # Only the costs depend on the values, the durations are kept. The
+        # cost of going from i to j is durations[i, j] - values[j].
+        if self.durations is None:
+            self.compute_matrices()
+        self.values = np.asarray(values)
+        for location, value in zip(self.locations, self.values.tolist()):
+            location.value = value
+        self.cost_table = None
+
+    def compute_tables(self):
+        import numpy as np
+        # Plain lists are faster than NumPy scalar indexing in Python loops,
+        # they are built at the first access. Return False if the instance is
+        # too large for them, see instancefile.
+        if self.durations is None:
+            self.compute_matrices()
+        if (len(self.locations)
+                > instancefile.MAXIMUM_NUMBER_OF_LOCATIONS_OF_TABLES):
+            return False
+        if self.duration_table is None:
+            self.duration_table = self.durations.tolist()
+        if self.cost_table is None:
+            self.cost_table = (
+                self.durations - self.values[np.newaxis, :]).tolist()
+        return True
+
+    def compute_graph(self):
+        from arcgraph import ArcGraph
+        # Feasible arcs between visits, computed once for all the searches on
+        # the instance. It may be set from the graph of a larger instance
+        # instead, see ArcGraph.subgraph.
+        if self.durations is None:
+            self.compute_matrices()
+        self.graph = ArcGraph(
+            [location.visit_intervals for location in self.locations],
+            self.durations)
+
+    def candidate_graph(self, candidates):
+        from arcgraph import ArcGraph
+        # Feasible arcs from each location to its candidate successors only,
+        # for one search, the other arcs are never built.
+        if self.durations is None:
+            self.compute_matrices()
+        return ArcGraph(
+            [location.visit_intervals for location in self.locations],
+            self.durations,
+            candidates=candidates)
 
     def duration(self, location_id_1, location_id_2):
-        xd = self.locations[location_id_2].x - self.locations[location_id_1].x
-        yd = self.locations[location_id_2].y - self.locations[location_id_1].y
-        d = round(math.sqrt(xd * xd + yd * yd))
-        return d
+        if self.durations is None:
+            # Durations are computed one at a time until the matrix is
+            # needed, checking a certificate only reads a few of them.
+            location_1 = self.locations[location_id_1]
+            location_2 = self.locations[location_id_2]
+            return instancefile.compute_duration(
+                location_1.x, location_1.y, location_2.x, location_2.y)
+        if self.duration_table is None and not self.compute_tables():
+            return int(self.durations[location_id_1, location_id_2])
+        return self.duration_table[location_id_1][location_id_2]
 
     def cost(self, location_id_1, location_id_2):
-        xd = self.locations[location_id_2].x - self.locations[location_id_1].x
-        yd = self.locations[location_id_2].y - self.locations[location_id_1].y
-        d = round(math.sqrt(xd * xd + yd * yd))
-        return d - self.locations[location_id_2].value
+        if self.durations is None:
+            return (self.duration(location_id_1, location_id_2)
+                    - self.locations[location_id_2].value)
+        if self.cost_table is None and not self.compute_tables():
+            return (self.durations[location_id_1, location_id_2]
+                    - self.values[location_id_2]).item()
+        return self.cost_table[location_id_1][location_id_2]
+
+    def cost_row(self, location_id):
+        # Costs from location_id to each location.
+        if self.cost_table is None and not self.compute_tables():
+            return (self.durations[location_id] - self.values).tolist()
+        return self.cost_table[location_id]
 
     def write(self, filepath):
         data = {"visit_intervals": [location.visit_intervals
@@ -99,81 +193,235 @@ class BranchingScheme:
     @total_ordering
     class Node:
 
-        id = None
-        father = None
-        last = None
-        path = []
-        currentTime = 0
-        cost = None
-        guide = None
-        next_child_pos = (0, 1)
+        # The route is recovered from the father pointers, the visited
+        # locations are kept as a bitmask.
+        __slots__ = (
+            "id",
+            "father",
+            "last",
+            "visited",
+            "currentTime",
+            "cost",
+            "guide",
+            "successors",
+            "next_child_pos")
 
         def __lt__(self, other):
             if self.guide != other.guide:
                 return self.guide < other.guide
             return self.id < other.id
 
-    def __init__(self, instance):
+    def __init__(self, instance, statistics=False, candidates=None):
         self.instance = instance
         self.id = 0
+        # Clients which may follow each location, all of them if None, see
+        # spatialindex.candidate_successors.
+        self.candidates = candidates
+        # Counters of the search, only kept when asked for since they are
+        # updated at each call of next_child, bound and dominates.
+        self.statistics = None
+        if statistics:
+            self.statistics = {
+                "late_arcs": 0,
+                "filtered_arcs": 0,
+                "children": 0,
+                "visited_successors": 0,
+                "maximum_depth": 0,
+                "bound_tests": 0,
+                "bound_prunes": 0,
+                "dominance_tests": 0,
+                "dominances": 0,
+                "time_arcs": 0.0,
+                "time_successors": 0.0,
+                "time_bounds": 0.0}
+        # Called with the route and the cost of each complete route better
+        # than the previous ones, see solve.
+        self.new_solution_callback = None
+        self.best_solution_cost = math.inf
+        start = time.perf_counter()
+        self.compute_arcs()
+        if self.statistics is not None:
+            self.statistics["time_arcs"] += time.perf_counter() - start
+        self.update_costs()
+
+    def update_costs(self):
+        # To be called when the values of the instance change, the arcs only
+        # depend on the durations and the visit intervals and are kept.
+        start = time.perf_counter()
+        self.compute_successors()
+        middle = time.perf_counter()
+        self.compute_bounds()
+        if self.statistics is not None:
+            self.statistics["time_successors"] += middle - start
+            self.statistics["time_bounds"] += time.perf_counter() - middle
+
+    def write_statistics(self, filepath):
+        with open(filepath, 'w') as json_file:
+            json.dump(self.statistics, json_file, indent=4)
+
+    def compute_arcs(self):
+        # arcs[i][s] lists the (location, slot, end time) reachable after
+        # visiting location i during slot s, from the graph of the instance.
+        # Going back to the depot is always possible.
+        locations = self.instance.locations
+        self.arcs = []
+        self.root_arcs = []
+        if locations == []:
+            return
+        if self.candidates is not None:
+            graph = self.instance.candidate_graph(self.candidates)
+        else:
+            if self.instance.graph is None:
+                self.instance.compute_graph()
+            graph = self.instance.graph
+        if self.statistics is not None:
+            self.statistics["late_arcs"] += graph.number_of_eliminated_arcs()
+            self.statistics["filtered_arcs"] += (
+                graph.number_of_filtered_arcs())
+        # The route ends with the depot's last visit interval, its end time
+        # doesn't matter since the depot has no successors.
+        depot_slot = len(locations[0].visit_intervals) - 1
+        self.depot_arc = (
+            0, depot_slot, locations[0].visit_intervals[depot_slot][1])
+
+        states = list(zip(
+            graph.locations.tolist(),
+            graph.slots.tolist(),
+            graph.ends.tolist()))
+        heads = graph.heads.tolist()
+        arc_starts = graph.arc_starts.tolist()
+        location_starts = graph.location_starts.tolist()
+        # Back at the depot, the route is complete.
+        self.arcs.append([[] for _ in locations[0].visit_intervals])
+        for i in range(1, len(locations)):
+            self.arcs.append([
+                [self.depot_arc]
+                + [states[b] for b in heads[arc_starts[a]:arc_starts[a + 1]]]
+                for a in range(location_starts[i], location_starts[i + 1])])
+        self.root_arcs = [states[b] for b in graph.root_heads.tolist()]
+
+    def compute_successors(self):
+        # successors[i][s] lists the (location, slot, cost, end time) of
+        # arcs[i][s], sorted by cost.
+        locations = self.instance.locations
+        self.successors = []
+        self.root_successors = []
+        if locations == []:
+            return
+
+        def sorted_successors(costs, arcs):
+            successors = [(j, slot, costs[j], end_time)
+                          for j, slot, end_time in arcs]
+            successors.sort(key=lambda successor: successor[2])
+            return successors
+
+        for location, arcs in zip(locations, self.arcs):
+            costs = self.instance.cost_row(location.id)
+            self.successors.append([
+                sorted_successors(costs, slot_arcs) for slot_arcs in arcs])
+        # The root may go straight back to the depot at no cost.
+        _, depot_slot, depot_end = self.depot_arc
+        self.root_successors = (
+            [(0, depot_slot, 0, depot_end)]
+            + sorted_successors(
+                self.instance.cost_row(0), self.root_arcs))
+
+    def compute_bounds(self):
+        # bounds[i][s] is a lower bound of the cost of going back to the depot
+        # after visiting location i during slot s. Elementarity is relaxed, so
+        # states form a DAG ordered by visit interval and a backward pass over
+        # the successor lists is enough.
+        locations = self.instance.locations
+        self.bounds = [[0 for _ in location.visit_intervals]
+                       for location in locations]
+        self.root_bound = 0
+        if locations == []:
+            return
+        states = sorted(
+            ((interval[0], interval[1], location.id, slot)
+             for location in locations[1:]
+             for slot, interval in enumerate(location.visit_intervals)),
+            reverse=True)
+        for _, group in groupby(states, key=lambda state: state[:2]):
+            group = [(i, slot) for _, _, i, slot in group]
+            members = set(group)
+            for i, slot in group:
+                self.bounds[i][slot] = min(
+                    added_cost + self.bounds[j][t]
+                    for j, t, added_cost, _ in self.successors[i][slot]
+                    if (j, t) not in members)
+            # Zero-length windows at the same place and time reach each
+            # other, relax these arcs a bounded number of times.
+            for _ in range(len(group) - 1):
+                for i, slot in group:
+                    for j, t, added_cost, _ in self.successors[i][slot]:
+                        if (j, t) in members:
+                            self.bounds[i][slot] = min(
+                                self.bounds[i][slot],
+                                added_cost + self.bounds[j][t])
+        self.root_bound = min(
+            added_cost + self.bounds[j][t]
+            for j, t, added_cost, _ in self.root_successors)
 
     def root(self):
         # The root contains the depot
         node = self.Node()
         node.father = None
-        node.path = []
+        node.visited = 0
+        node.last = None
         if self.instance.locations != []:
             node.last = self.instance.locations[0]
         node.cost = 0
         node.currentTime = 0
-        node.guide = 0
+        node.guide = self.root_bound
+        node.successors = self.root_successors
+        node.next_child_pos = 0
         node.id = self.id
         self.id += 1
         return node
 
     def next_child(self, father):
-        next_loc = father.next_child_pos[0]
-        current_interval = father.next_child_pos[1]
-        # not accessible node
-        if self.instance.locations == []:
-            return None
-        if next_loc == 0:
-            arrivalTime = 0
-        else:
-            arrivalTime = father.currentTime + self.instance.duration(father.last.id,
-                                                                 next_loc)
-        # nextchildpos incrementation
-        if father.next_child_pos[1] == 0:
-            father.next_child_pos = (next_loc, 1)
-        else:
-            father.next_child_pos = (next_loc+1, 0)
-
-        # already visited node
-        if next_loc in father.path:
-            return None
-
-        if arrivalTime > self.instance.locations[next_loc].visit_intervals[current_interval][0]:
+        successors = father.successors
+        pos = father.next_child_pos
+        # skip already visited locations
+        while pos < len(successors) and (father.visited >> successors[pos][0]) & 1:
+            pos += 1
+        if self.statistics is not None:
+            self.statistics["visited_successors"] += pos - father.next_child_pos
+        if pos == len(successors):
+            father.next_child_pos = pos
             return None
+        next_loc, slot, added_cost, end_time = successors[pos]
+        father.next_child_pos = pos + 1
 
         # new child node
         child = self.Node()
         child.father = father
-        child.path = father.path.copy()
-        child.path.append(next_loc)
+        child.visited = father.visited | (1 << next_loc)
         child.last = self.instance.locations[next_loc]
-        added_cost = 0 if father.last.id == child.last.id else \
-            self.instance.cost(father.last.id, child.last.id)
         child.cost = father.cost + added_cost
-        child.guide = child.cost
-        child.currentTime = self.instance.locations[next_loc].visit_intervals[current_interval][1]
+        # guide = cost + lower bound of the cost to go back to the depot
+        child.guide = child.cost + self.bounds[next_loc][slot]
+        child.currentTime = end_time
+        child.successors = self.successors[next_loc][slot]
+        child.next_child_pos = 0
         child.id = self.id
         self.id += 1
+        if (next_loc == 0
+                and self.new_solution_callback is not None
+                and child.cost < self.best_solution_cost):
+            self.new_solution(self.to_solution(child), child.cost)
+        if self.statistics is not None:
+            self.statistics["children"] += 1
+            depth = bin(child.visited).count("1")
+            if depth > self.statistics["maximum_depth"]:
+                self.statistics["maximum_depth"] = depth
         return child
         # TODO END
 
     def infertile(self, node):
         # TODO START
-        return node.next_child_pos[0] == len(self.instance.locations)
+        return node.next_child_pos == len(node.successors)
         # TODO END
 
     def leaf(self, node):
@@ -185,11 +433,13 @@ class BranchingScheme:
         # TODO START
         if node_1.last is None or node_2.last is None:
             return False
-        if node_1.last.id != 0:
-            return False
         if node_2.last.id != 0:
             return False
-        return node_1.cost < node_2.cost
+        # node_1 cannot lead to a solution better than node_2.
+        if self.statistics is not None:
+            self.statistics["bound_tests"] += 1
+            self.statistics["bound_prunes"] += node_1.guide >= node_2.cost
+        return node_1.guide >= node_2.cost
         # TODO END
 
     # Solution pool.
@@ -205,7 +455,9 @@ class BranchingScheme:
 
     def equals(self, node_1, node_2):
         # TODO START
-        return node_1.path == node_2.path
+        if node_1.visited != node_2.visited:
+            return False
+        return self.to_solution(node_1) == self.to_solution(node_2)
         # TODO END
 
     # Dominances.
@@ -222,25 +474,40 @@ class BranchingScheme:
 
         def __hash__(self):
             # TODO START
-            return hash((self.node.last, self.node.cost))
+            return hash(self.node.last)
             # TODO END
 
         def __eq__(self, other):
-            return (
-                # Same last location.
-                self.node.last == other.node.last
-                # Same visited locations.
-                and self.node.path == other.node.path)
+            # Same last location, dominance is checked inside the bucket.
+            return self.node.last == other.node.last
 
     def dominates(self, node_1, node_2):
         # TODO START
-        if node_1.cost <= node_2.cost:
-            return True
-        return False
+        # Cheapest tests first, most pairs fail on cost or time.
+        if self.statistics is not None:
+            self.statistics["dominance_tests"] += 1
+        if node_1.cost > node_2.cost:
+            return False
+        if node_1.currentTime > node_2.currentTime:
+            return False
+        # Visited locations of node_1 are a subset of those of node_2.
+        if node_1.visited & ~node_2.visited != 0:
+            return False
+        if self.statistics is not None:
+            self.statistics["dominances"] += 1
+        return True
         # TODO END
 
     # Outputs.
 
+    def new_solution(self, route, cost):
+        if self.new_solution_callback is None:
+            return
+        if cost >= self.best_solution_cost:
+            return
+        self.best_solution_cost = cost
+        self.new_solution_callback(route, cost)
+
     def display(self, node):
         # TODO START
         return str(node.cost)
@@ -260,6 +527,199 @@ class BranchingScheme:
         # TODO END
 
 
+def label_setting(
+        branching_scheme,
+        maximum_number_of_routes=1,
+        maximum_cost=math.inf,
+        time_limit=math.inf):
+    """Return the routes of lowest cost with an exact label-setting algorithm
+    over the (location, slot) states of the branching scheme.
+
+    Labels are extended by increasing time. A label is discarded when another
+    label at the same location has a lower cost, an earlier time and a subset
+    of its visited locations, or when its cost plus the bound of its state
+    cannot beat the maximum_number_of_routes-th best route found. Only routes
+    of cost strictly lower than maximum_cost are returned, best first.
+
+    """
+    # Only imported to solve, checking a certificate doesn't need it.
+    import treesearchsolverpy
+    start = time.perf_counter()
+    bs = branching_scheme
+    statistics = bs.statistics
+    locations = bs.instance.locations
+    output = {
+        "routes": [],
+        "costs": [],
+        "optimal": True,
+        "number_of_labels": 0,
+        "elapsed_time": 0}
+    if locations == []:
+        if 0 < maximum_cost:
+            output["routes"].append([])
+            output["costs"].append(0)
+        return output
+
+    # A label is [time, location, slot, cost, visited, father, dominated].
+    TIME, LOCATION, SLOT, COST, VISITED, FATHER, DOMINATED = range(7)
+    routes = []
+
+    def add_route(cost, route):
+        if cost >= maximum_cost:
+            return
+        if any(other_route == route for _, _, other_route in routes):
+            return
+        routes.append((cost, len(routes), route))
+        routes.sort()
+        del routes[maximum_number_of_routes:]
+        bs.new_solution(route, cost)
+
+    def label_route(label):
+        route = []
+        while label[FATHER] is not None:
+            route.append(label[LOCATION])
+            label = label[FATHER]
+        route.reverse()
+        return route
+
+    def threshold():
+        if len(routes) < maximum_number_of_routes:
+            return maximum_cost
+        return routes[-1][0]
+
+    # Labels are only pruned by bound once good routes are known, they are
+    # first looked for with a short beam search.
+    solution_pool = treesearchsolverpy.iterative_beam_search(
+        bs,
+        maximum_size_of_the_queue=16,
+        maximum_pool_size=maximum_number_of_routes,
+        time_limit=time_limit,
+        verbose=False)["solution_pool"]
+    for node in solution_pool.solutions:
+        add_route(node.cost, bs.to_solution(node))
+
+    root = [0, 0, None, 0, 0, None, False]
+    buckets = [[] for _ in locations]
+    queue = [(0, 0, root)]
+    number_of_labels = 1
+    number_of_extended_labels = 0
+    number_of_bound_tests = 0
+    number_of_bound_prunes = 0
+    number_of_dominance_tests = 0
+    number_of_dominances = 0
+    while queue:
+        number_of_extended_labels += 1
+        if ((number_of_extended_labels & 255) == 0
+                and time.perf_counter() - start > time_limit):
+            output["optimal"] = False
+            break
+        _, _, label = heapq.heappop(queue)
+        if label[DOMINATED]:
+            continue
+        upper_bound = threshold()
+        location = label[LOCATION]
+        cost = label[COST]
+        visited = label[VISITED]
+        if location == 0:
+            successors = bs.root_successors
+        else:
+            # The threshold may have decreased since the label was created.
+            number_of_bound_tests += 1
+            if cost + bs.bounds[location][label[SLOT]] >= upper_bound:
+                number_of_bound_prunes += 1
+                continue
+            successors = bs.successors[location][label[SLOT]]
+        for j, slot, added_cost, end_time in successors:
+            new_cost = cost + added_cost
+            if j == 0:
+                if new_cost < upper_bound:
+                    add_route(new_cost, label_route(label))
+                    upper_bound = threshold()
+                continue
+            if (visited >> j) & 1:
+                continue
+            number_of_bound_tests += 1
+            if new_cost + bs.bounds[j][slot] >= upper_bound:
+                number_of_bound_prunes += 1
+                continue
+            new_visited = visited | (1 << j)
+            bucket = buckets[j]
+            dominated = False
+            for other in bucket:
+                number_of_dominance_tests += 1
+                if (other[COST] <= new_cost
+                        and other[TIME] <= end_time
+                        and other[VISITED] & ~new_visited == 0):
+                    dominated = True
+                    break
+            if dominated:
+                number_of_dominances += 1
+                continue
+            new_label = [
+                end_time, j, slot, new_cost, new_visited, label, False]
+            kept = [new_label]
+            for other in bucket:
+                if (new_cost <= other[COST]
+                        and end_time <= other[TIME]
+                        and new_visited & ~other[VISITED] == 0):
+                    other[DOMINATED] = True
+                    number_of_dominances += 1
+                else:
+                    kept.append(other)
+            buckets[j] = kept
+            heapq.heappush(queue, (end_time, number_of_labels, new_label))
+            number_of_labels += 1
+
+    if statistics is not None:
+        statistics["labels"] = statistics.get("labels", 0) + number_of_labels
+        statistics["bound_tests"] += number_of_bound_tests
+        statistics["bound_prunes"] += number_of_bound_prunes
+        statistics["dominance_tests"] += number_of_dominance_tests
+        statistics["dominances"] += number_of_dominances
+    output["routes"] = [route for _, _, route in routes]
+    output["costs"] = [cost for cost, _, _ in routes]
+    output["number_of_labels"] = number_of_labels
+    output["elapsed_time"] = time.perf_counter() - start
+    return output
+
+
+def solve(
+        instance,
+        algorithm="iterative_beam_search",
+        time_budget=math.inf,
+        on_improvement=None,
+        candidates=None):
+    """Return the best route found within time_budget seconds, as an
+    incumbent of anytime.Incumbents. Each improved route is passed to
+    on_improvement as soon as it is found.
+
+    algorithm is greedy, iterative_beam_search, best_first_search or
+    label_setting.
+
+    """
+    incumbents = anytime.Incumbents(on_improvement, time_budget)
+    # The empty route is always feasible.
+    incumbents.add([], 0)
+    if len(instance.locations) <= 1:
+        return incumbents.best
+    branching_scheme = BranchingScheme(instance, candidates=candidates)
+    branching_scheme.new_solution_callback = incumbents.add
+    branching_scheme.best_solution_cost = 0
+    if algorithm == "label_setting":
+        label_setting(
+            branching_scheme, time_limit=incumbents.remaining_time())
+    elif algorithm in [
+            "greedy", "iterative_beam_search", "best_first_search"]:
+        import treesearchsolverpy
+        getattr(treesearchsolverpy, algorithm)(
+            branching_scheme,
+            time_limit=incumbents.remaining_time(),
+            verbose=False)
+    else:
+        raise ValueError(f"Unknown algorithm: {algorithm}.")
+    return incumbents.best
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='')
@@ -277,6 +737,16 @@ if __name__ == "__main__":
         type=str,
         default=None,
         help='')
+    parser.add_argument(
+        "-s", "--statistics",
+        type=str,
+        default=None,
+        help='file where the search statistics are written')
+    parser.add_argument(
+        "--number-of-candidates",
+        type=int,
+        default=None,
+        help='number of nearest clients which may follow each client')
 
     args = parser.parse_args()
 
@@ -305,19 +775,43 @@ if __name__ == "__main__":
 
     else:
         instance = Instance(args.instance)
-        branching_scheme = BranchingScheme(instance)
-        if args.algorithm == "greedy":
-            output = treesearchsolverpy.greedy(
-                branching_scheme)
-        elif args.algorithm == "best_first_search":
-            output = treesearchsolverpy.best_first_search(
-                branching_scheme,
-                time_limit=30)
-        elif args.algorithm == "iterative_beam_search":
-            output = treesearchsolverpy.iterative_beam_search(
-                branching_scheme,
-                time_limit=30)
-        solution = branching_scheme.to_solution(output["solution_pool"].best)
+        candidates = None
+        if args.number_of_candidates is not None:
+            import spatialindex
+            candidates = spatialindex.candidate_successors(
+                instance.locations, args.number_of_candidates)
+        branching_scheme = BranchingScheme(
+            instance,
+            statistics=args.statistics is not None,
+            candidates=candidates)
+        if args.algorithm == "label_setting":
+            output = label_setting(branching_scheme, time_limit=30)
+            solution = output["routes"][0]
+            print(f"Cost:                        {output['costs'][0]}")
+            print(f"Optimal:                     {output['optimal']}")
+            print(f"Number of labels:            {output['number_of_labels']}")
+            print(f"Time:                        {output['elapsed_time']:.3f}")
+            number_of_nodes = output["number_of_labels"]
+        else:
+            import treesearchsolverpy
+            if args.algorithm == "greedy":
+                output = treesearchsolverpy.greedy(
+                    branching_scheme)
+            elif args.algorithm == "best_first_search":
+                output = treesearchsolverpy.best_first_search(
+                    branching_scheme,
+                    time_limit=30)
+            elif args.algorithm == "iterative_beam_search":
+                output = treesearchsolverpy.iterative_beam_search(
+                    branching_scheme,
+                    time_limit=30)
+            solution = branching_scheme.to_solution(
+                output["solution_pool"].best)
+            number_of_nodes = output["number_of_nodes"]
+        if args.statistics is not None:
+            branching_scheme.statistics["number_of_nodes"] = number_of_nodes
+            branching_scheme.statistics["time"] = output["elapsed_time"]
+            branching_scheme.write_statistics(args.statistics)
         if args.certificate is not None:
             data = {"locations": solution}
             with open(args.certificate, 'w') as json_file:
@@ -0,0 +1,168 @@
+"""Read instances from JSON files or from the binary format.
+
+An instance in the binary format is a directory of .npy arrays, which are
+memory-mapped when read:
+- visit_intervals.npy: (number of locations, number of slots, 2)
+- xs.npy, ys.npy: (number of locations)
+- values.npy: (number of locations), only for elementary shortest paths
+- durations.npy: (number of locations, number of locations), optional
+
+NumPy is only imported to read or write the binary format and to compute
+duration matrices, a JSON instance is read without it.
+
+Usage: python instancefile.py -i ../data/vehicleroutingwithslots \\
+        -o ../data/vehicleroutingwithslots_binary [--durations]
+
+"""
+
+import json
+import math
+import os
+
+ARRAYS = ["visit_intervals", "xs", "ys", "values"]
+
+# The solvers copy the matrices of an instance into lists, which are faster to
+# index in Python loops but take several times their memory. Above this number
+# of locations, the matrices, possibly memory-mapped, are read directly.
+MAXIMUM_NUMBER_OF_LOCATIONS_OF_TABLES = 1000
+
+
+def compute_duration(x_1, y_1, x_2, y_2):
+    """Return the rounded distance between two points, an entry of the matrix
+    of compute_durations, without NumPy."""
+    return round(math.hypot(x_2 - x_1, y_2 - y_1))
+
+
+def compute_durations(xs, ys, durations=None, block_size=1024):
+    """Return the matrix of the rounded distances between the points. It is
+    computed by blocks of rows into durations if it is given, a new matrix
+    otherwise, so that only the intermediate arrays of a block are in
+    memory."""
+    import numpy as np
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    if durations is None:
+        durations = np.empty((len(xs), len(xs)), dtype=np.int64)
+    for start in range(0, len(xs), block_size):
+        end = start + block_size
+        durations[start:end] = np.rint(np.hypot(
+            xs[np.newaxis, :] - xs[start:end, np.newaxis],
+            ys[np.newaxis, :] - ys[start:end, np.newaxis]))
+    return durations
+
+
+def read_arrays(filepath, mmap_mode="r"):
+    """Return the arrays of an instance in the binary format."""
+    import numpy as np
+    arrays = {}
+    for name in ARRAYS + ["durations"]:
+        path = os.path.join(filepath, name + ".npy")
+        if os.path.exists(path):
+            arrays[name] = np.load(path, mmap_mode=mmap_mode)
+    return arrays
+
+
+def read(filepath):
+    """Return the data of an instance, with the same lists as in the JSON
+    format, and its duration matrix if it is stored, None otherwise."""
+    if not os.path.isdir(filepath):
+        with open(filepath) as json_file:
+            return json.load(json_file), None
+    arrays = read_arrays(filepath)
+    data = {name: arrays[name].tolist() for name in ARRAYS if name in arrays}
+    return data, arrays.get("durations")
+
+
+def write(filepath, data, durations=False):
+    """Write the data of an instance, as read from a JSON file, in the binary
+    format. The duration matrix is computed and stored if durations is
+    True."""
+    import numpy as np
+    number_of_locations = len(data["xs"])
+    number_of_slots = len(data["visit_intervals"][0]) if data["xs"] else 0
+    if any(len(intervals) != number_of_slots
+           for intervals in data["visit_intervals"]):
+        raise ValueError(
+            "All locations must have the same number of visit intervals.")
+    arrays = {
+        "visit_intervals": np.array(
+            data["visit_intervals"],
+            dtype=np.int64).reshape(number_of_locations, number_of_slots, 2),
+        "xs": np.array(data["xs"]),
+        "ys": np.array(data["ys"])}
+    if "values" in data:
+        arrays["values"] = np.array(data["values"])
+    write_arrays(filepath, arrays, durations)
+
+
+def write_arrays(filepath, arrays, durations=False, block_size=1024):
+    """Write the arrays of an instance in the binary format. The duration
+    matrix is computed by blocks of rows directly into the file, it does not
+    have to fit in memory."""
+    import numpy as np
+    os.makedirs(filepath, exist_ok=True)
+    for name in ARRAYS:
+        if name in arrays:
+            np.save(os.path.join(filepath, name + ".npy"), arrays[name])
+    if durations:
+        number_of_locations = len(arrays["xs"])
+        matrix = np.lib.format.open_memmap(
+            os.path.join(filepath, "durations.npy"),
+            mode="w+",
+            dtype=np.int64,
+            shape=(number_of_locations, number_of_locations))
+        compute_durations(arrays["xs"], arrays["ys"], matrix, block_size)
+        matrix.flush()
+
+
+def write_json(filepath, arrays, block_size=4096):
+    """Write the arrays of an instance in a JSON file, by blocks of
+    locations."""
+    with open(filepath, 'w') as json_file:
+        separator = "{"
+        for name in ARRAYS:
+            if name not in arrays:
+                continue
+            array = arrays[name]
+            json_file.write(f'{separator}"{name}": [')
+            for start in range(0, len(array), block_size):
+                if start > 0:
+                    json_file.write(", ")
+                json_file.write(
+                    json.dumps(array[start:start + block_size].tolist())[1:-1])
+            json_file.write("]")
+            separator = ", "
+        json_file.write("}" if separator == ", " else "{}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+        "-i", "--input",
+        type=str,
+        help='JSON instance or directory of JSON instances')
+    parser.add_argument(
+        "-o", "--output",
+        type=str,
+        help='')
+    parser.add_argument(
+        "--durations",
+        action="store_true",
+        help='store the duration matrix')
+
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        conversions = [
+            (os.path.join(args.input, name),
+             os.path.join(args.output, name[:-len(".json")]))
+            for name in sorted(os.listdir(args.input))
+            if name.endswith(".json")]
+    else:
+        conversions = [(args.input, args.output)]
+    for input_path, output_path in conversions:
+        with open(input_path) as json_file:
+            data = json.load(json_file)
+        write(output_path, data, args.durations)
+        print(f"{input_path} -> {output_path}")
@@ -0,0 +1,194 @@
+"""Generate random instances of any size.
+
+Locations are drawn with NumPy, all at once, and written by blocks, in JSON or
+in the binary format of instancefile.py. Each instance of a series has its own
+random stream derived from the seed, so a series is the same whatever the
+number of workers generating it.
+
+The instances of data/ come from the generator algorithm of
+elementaryshortestpathwithslots.py and vehicleroutingwithslots.py.
+
+Usage: python instancegenerator.py -o ../data/large/instance \\
+        -n 1000 10000 100000 [-p vehicle_routing] [-d clustered] [-w 4]
+
+"""
+
+import os
+import numpy as np
+import instancefile
+
+
+def generate(
+        number_of_locations,
+        number_of_slots=2,
+        horizon=1000,
+        maximum_visit_duration=100,
+        grid_size=100,
+        distribution="uniform",
+        number_of_clusters=10,
+        cluster_spread=0.05,
+        values=True,
+        maximum_value=100,
+        seed=0):
+    """Return the arrays of a random instance.
+
+    A visit interval starts between 0 and the horizon and lasts at most
+    maximum_visit_duration. With the clustered distribution, locations are
+    normally distributed around number_of_clusters centers, with a standard
+    deviation of cluster_spread times the grid size.
+
+    """
+    generator = np.random.default_rng(seed)
+    starts = generator.integers(
+        0, horizon + 1, size=(number_of_locations, number_of_slots))
+    visit_durations = generator.integers(
+        0, maximum_visit_duration + 1,
+        size=(number_of_locations, number_of_slots))
+    visit_intervals = np.stack([starts, starts + visit_durations], axis=2)
+
+    if distribution == "uniform":
+        xs = generator.integers(0, grid_size + 1, size=number_of_locations)
+        ys = generator.integers(0, grid_size + 1, size=number_of_locations)
+    elif distribution == "clustered":
+        centers = generator.uniform(0, grid_size, size=(number_of_clusters, 2))
+        clusters = generator.integers(
+            0, number_of_clusters, size=number_of_locations)
+        points = generator.normal(
+            centers[clusters], cluster_spread * grid_size)
+        points = np.clip(np.rint(points), 0, grid_size).astype(np.int64)
+        xs, ys = points[:, 0], points[:, 1]
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}.")
+
+    arrays = {"visit_intervals": visit_intervals, "xs": xs, "ys": ys}
+    if values:
+        arrays["values"] = generator.integers(
+            0, maximum_value + 1, size=number_of_locations)
+    return arrays
+
+
+def generate_file(filepath, file_format, durations, number_of_locations, parameters):
+    arrays = generate(number_of_locations, **parameters)
+    if file_format == "json":
+        instancefile.write_json(filepath, arrays)
+    else:
+        instancefile.write_arrays(filepath, arrays, durations)
+    return filepath
+
+
+def generate_series(
+        prefix,
+        sizes,
+        file_format="json",
+        durations=False,
+        number_of_workers=1,
+        seed=0,
+        **parameters):
+    """Generate an instance of each size, written to prefix_<size>.json or to
+    the directory prefix_<size> in the binary format."""
+    directory = os.path.dirname(prefix)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (f"{prefix}_{size}" + (".json" if file_format == "json" else ""),
+         file_format,
+         durations,
+         size,
+         {**parameters, "seed": instance_seed})
+        for size, instance_seed in zip(sizes, seeds)]
+    if number_of_workers > 1:
+        import multiprocessing
+        with multiprocessing.Pool(number_of_workers) as pool:
+            return pool.starmap(generate_file, tasks)
+    return [generate_file(*task) for task in tasks]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+        "-o", "--output",
+        type=str,
+        help='prefix of the instance files')
+    parser.add_argument(
+        "-n", "--number-of-locations",
+        type=int,
+        nargs="+",
+        help='sizes of the instances')
+    parser.add_argument(
+        "-p", "--problem",
+        type=str,
+        choices=["elementary_shortest_path", "vehicle_routing"],
+        default="elementary_shortest_path",
+        help='values are only generated for elementary shortest paths')
+    parser.add_argument(
+        "-f", "--format",
+        type=str,
+        choices=["json", "binary"],
+        default="json",
+        help='')
+    parser.add_argument(
+        "--durations",
+        action="store_true",
+        help='store the duration matrix, binary format only')
+    parser.add_argument(
+        "-s", "--number-of-slots",
+        type=int,
+        default=2,
+        help='')
+    parser.add_argument(
+        "--horizon",
+        type=int,
+        default=1000,
+        help='')
+    parser.add_argument(
+        "--maximum-visit-duration",
+        type=int,
+        default=100,
+        help='')
+    parser.add_argument(
+        "--grid-size",
+        type=int,
+        default=100,
+        help='')
+    parser.add_argument(
+        "-d", "--distribution",
+        type=str,
+        choices=["uniform", "clustered"],
+        default="uniform",
+        help='')
+    parser.add_argument(
+        "--number-of-clusters",
+        type=int,
+        default=10,
+        help='')
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help='')
+    parser.add_argument(
+        "-w", "--number-of-workers",
+        type=int,
+        default=1,
+        help='')
+
+    args = parser.parse_args()
+
+    filepaths = generate_series(
+        args.output,
+        args.number_of_locations,
+        file_format=args.format,
+        durations=args.durations,
+        number_of_workers=args.number_of_workers,
+        seed=args.seed,
+        number_of_slots=args.number_of_slots,
+        horizon=args.horizon,
+        maximum_visit_duration=args.maximum_visit_duration,
+        grid_size=args.grid_size,
+        distribution=args.distribution,
+        number_of_clusters=args.number_of_clusters,
+        values=args.problem == "elementary_shortest_path")
+    for filepath in filepaths:
+        print(filepath)
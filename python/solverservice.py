@@ -0,0 +1,229 @@
+"""Resident solver service.
+
+Requests are read as JSON lines, from the standard input or from the
+connections to a local TCP port, and answered as JSON lines in the order they
+complete. They are run concurrently by a pool of worker processes, which
+import the solver modules once and keep the recently used instances loaded,
+with their matrices and arc graphs.
+
+Requests:
+    {"id": 1, "command": "solve", "module": "elementaryshortestpathwithslots",
+     "instance": "../data/elementaryshortestpathwithslots/instance_10.json",
+     "algorithm": "label_setting", "time_budget": 1,
+     "certificate": "solution.json"}
+    {"id": 2, "command": "check", "module": "vehicleroutingwithslots",
+     "instance": "../data/vehicleroutingwithslots/instance_10.json",
+     "certificate": "solution.json"}
+
+A solve request may also give "parameters", passed to the solve function of
+the module, and a check request may give the "locations" of the solution
+instead of a certificate file. An answer has the id of its request and either
+its result or an "error".
+
+Usage: python solverservice.py [-w 4] [--port 8765] < requests.jsonl
+
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+import checker
+
+# Whether the solutions of each module are routes of vehicles and whether
+# only the first visit interval of the locations may be used.
+MODULES = {
+        "elementaryshortestpathwithslots": (False, False),
+        "elementaryshortestpathwithsingleslot": (False, True),
+        "vehicleroutingwithslots": (True, False),
+        "vehicleroutingwithsingleslot": (True, True)}
+
+
+# State of a worker process.
+worker = {}
+
+
+def initialize_worker(cache_size):
+    # The answers are written to the standard output of the service.
+    sys.stdout = sys.stderr
+    worker["cache_size"] = cache_size
+    worker["instances"] = collections.OrderedDict()
+    for module_name in MODULES:
+        importlib.import_module(module_name)
+
+
+def load_instance(module_name, filepath):
+    # Instances of the checker are cached under the module name "checker". An
+    # instance is reloaded when its file changes.
+    key = (module_name,
+           os.path.abspath(filepath),
+           os.stat(filepath).st_mtime_ns)
+    instances = worker["instances"]
+    if key in instances:
+        instances.move_to_end(key)
+        return instances[key]
+    module = importlib.import_module(module_name)
+    instance = module.Instance(filepath)
+    instances[key] = instance
+    while len(instances) > worker["cache_size"]:
+        instances.popitem(last=False)
+    return instance
+
+
+def run_request(request):
+    start = time.perf_counter()
+    command = request.get("command")
+    module_name = request.get("module")
+    if module_name not in MODULES:
+        raise ValueError(f"Unknown module: {module_name}.")
+
+    if command == "solve":
+        module = importlib.import_module(module_name)
+        instance = load_instance(module_name, request["instance"])
+        parameters = dict(request.get("parameters", {}))
+        if "algorithm" in request:
+            parameters["algorithm"] = request["algorithm"]
+        best = module.solve(
+                instance,
+                time_budget=request.get("time_budget", math.inf),
+                **parameters)
+        result = {"locations": best["solution"], "cost": best["cost"]}
+        if "certificate" in request:
+            with open(request["certificate"], 'w') as json_file:
+                json.dump({"locations": best["solution"]}, json_file)
+
+    elif command == "check":
+        instance = load_instance("checker", request["instance"])
+        if "certificate" in request:
+            with open(request["certificate"]) as json_file:
+                data = json.load(json_file)
+        else:
+            data = {"locations": request["locations"]}
+        vehicle_routing, single_slot = MODULES[module_name]
+        result = checker.check_certificate(
+                instance, data, vehicle_routing, single_slot)
+
+    else:
+        raise ValueError(f"Unknown command: {command}.")
+
+    result["time"] = time.perf_counter() - start
+    return result
+
+
+class SolverService:
+
+    def __init__(self, number_of_workers=1, cache_size=16):
+        # Workers are started on demand, forked workers would inherit the
+        # open connections and keep them from being closed.
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+                number_of_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initialize_worker,
+                initargs=(cache_size,))
+
+    async def answer(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+        except ValueError as exception:
+            return {"id": None, "error": f"Invalid request: {exception}."}
+        answer = {"id": request.get("id")}
+        loop = asyncio.get_running_loop()
+        try:
+            answer.update(await loop.run_in_executor(
+                    self.executor, run_request, request))
+        except Exception as exception:
+            answer["error"] = f"{type(exception).__name__}: {exception}"
+        return answer
+
+    async def serve(self, readline, write):
+        # The requests of a stream are run concurrently, an answer is written
+        # as soon as it is available.
+        pending = set()
+
+        async def answer(line):
+            write(json.dumps(await self.answer(line)) + "\n")
+
+        while True:
+            line = await readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.create_task(answer(line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.gather(*pending)
+
+    async def serve_standard_streams(self):
+        loop = asyncio.get_running_loop()
+
+        def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        await self.serve(
+                lambda: loop.run_in_executor(None, sys.stdin.readline),
+                write)
+
+    async def serve_connection(self, reader, writer):
+        await self.serve(
+                reader.readline,
+                lambda text: writer.write(text.encode()))
+        await writer.drain()
+        writer.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+async def main(number_of_workers, cache_size, host, port):
+    service = SolverService(number_of_workers, cache_size)
+    try:
+        if port is None:
+            await service.serve_standard_streams()
+        else:
+            server = await asyncio.start_server(
+                    service.serve_connection, host, port)
+            async with server:
+                await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-w", "--number-of-workers",
+            type=int,
+            default=os.cpu_count(),
+            help='')
+    parser.add_argument(
+            "--cache-size",
+            type=int,
+            default=16,
+            help='number of instances kept loaded by each worker')
+    parser.add_argument(
+            "--host",
+            type=str,
+            default="127.0.0.1",
+            help='')
+    parser.add_argument(
+            "--port",
+            type=int,
+            default=None,
+            help='serve the connections to this TCP port instead of the '
+                 'standard input')
+
+    args = parser.parse_args()
+
+    asyncio.run(main(
+            args.number_of_workers, args.cache_size, args.host, args.port))
@@ -0,0 +1,99 @@
+import math
+import numpy as np
+
+
+def nearest_neighbors(xs, ys, number_of_neighbors, radius=None):
+    """Return for each point the list of its nearest other points, closest
+    first, ties broken by index.
+
+    At most number_of_neighbors points are returned, and only those at a
+    distance of at most radius if it is given. Points are bucketed in a grid
+    with about number_of_neighbors points per cell, and the points of a cell
+    look for their neighbors in growing squares of cells around it.
+
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    number_of_points = len(xs)
+    k = min(number_of_neighbors, number_of_points - 1)
+    if k <= 0:
+        return [[] for _ in range(number_of_points)]
+
+    x_min, y_min = xs.min(), ys.min()
+    width = xs.max() - x_min
+    height = ys.max() - y_min
+    cell_size = max(
+        math.sqrt(max(width, 1) * max(height, 1) * k / number_of_points),
+        1e-9)
+    number_of_columns = int(width // cell_size) + 1
+    number_of_rows = int(height // cell_size) + 1
+    columns = ((xs - x_min) // cell_size).astype(np.int64)
+    rows = ((ys - y_min) // cell_size).astype(np.int64)
+    cells = columns * number_of_rows + rows
+    # Points sorted by cell, the points of cell c are
+    # order[cell_starts[c]:cell_starts[c + 1]] and a range of rows of a
+    # column of the grid is contiguous.
+    order = np.argsort(cells, kind="stable")
+    cell_starts = np.searchsorted(
+        cells[order], np.arange(number_of_columns * number_of_rows + 1))
+
+    neighbors = [None] * number_of_points
+    for cell in np.unique(cells):
+        column, row = divmod(int(cell), number_of_rows)
+        queries = order[cell_starts[cell]:cell_starts[cell + 1]]
+        ring = 1
+        while True:
+            first_row = max(row - ring, 0)
+            last_row = min(row + ring, number_of_rows - 1)
+            candidates = np.concatenate([
+                order[cell_starts[c * number_of_rows + first_row]:
+                      cell_starts[c * number_of_rows + last_row + 1]]
+                for c in range(
+                    max(column - ring, 0),
+                    min(column + ring, number_of_columns - 1) + 1)])
+            distances = np.hypot(
+                xs[queries][:, np.newaxis] - xs[candidates][np.newaxis, :],
+                ys[queries][:, np.newaxis] - ys[candidates][np.newaxis, :])
+            distances[queries[:, np.newaxis] == candidates[np.newaxis, :]] = np.inf
+            # Points outside of the square are farther than ring cells.
+            whole_grid = (
+                ring >= max(column, number_of_columns - 1 - column)
+                and ring >= max(row, number_of_rows - 1 - row))
+            reach = ring * cell_size
+            if whole_grid or (radius is not None and radius <= reach):
+                break
+            if len(candidates) > k:
+                kth_distances = np.partition(distances, k - 1, axis=1)[:, k - 1]
+                if kth_distances.max() <= reach:
+                    break
+            ring += 1
+
+        for query, query_distances in zip(queries.tolist(), distances):
+            closest = np.lexsort((candidates, query_distances))[:k]
+            if radius is not None:
+                closest = closest[query_distances[closest] <= radius]
+            else:
+                closest = closest[np.isfinite(query_distances[closest])]
+            neighbors[query] = candidates[closest].tolist()
+    return neighbors
+
+
+def candidate_successors(locations, number_of_candidates, radius=None):
+    """Return for each location the ids of the clients it may be followed by.
+
+    The depot, location 0, may be followed by any client and any client may be
+    followed by the depot, these arcs are not listed.
+
+    """
+    if len(locations) <= 1:
+        return [[] for _ in locations]
+    clients = locations[1:]
+    neighbors = nearest_neighbors(
+        [location.x for location in clients],
+        [location.y for location in clients],
+        number_of_candidates,
+        radius)
+    return (
+        [[location.id for location in clients]]
+        + [[clients[j].id for j in client_neighbors]
+           for client_neighbors in neighbors])
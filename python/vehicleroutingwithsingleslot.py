@@ -1,6 +1,7 @@
 import json
 import math
-import columngenerationsolverpy
+import anytime
+import instancefile
 import elementaryshortestpathwithsingleslot as elp
 
 INF = 100000000
@@ -17,15 +18,21 @@ class Instance:
 
     def __init__(self, filepath=None):
         self.locations : list[Location] = []
+        self.durations = None
+        self.duration_table = None
+        self.graph = None
         if filepath is not None:
-            with open(filepath) as json_file:
-                data = json.load(json_file)
-                locations = zip(
-                        data["visit_intervals"],
-                        data["xs"],
-                        data["ys"])
-                for (intervals, x, y) in locations:
-                    self.add_location(intervals[0], x, y)
+            # JSON file or directory of the binary format.
+            data, durations = instancefile.read(filepath)
+            locations = zip(
+                    data["visit_intervals"],
+                    data["xs"],
+                    data["ys"])
+            for (intervals, x, y) in locations:
+                self.add_location(intervals[0], x, y)
+            # A stored matrix is used, otherwise it is built at first use.
+            if durations is not None:
+                self.compute_matrices(durations)
 
     def add_location(self, visit_interval, x, y):
         location = Location()
@@ -34,12 +41,56 @@ class Instance:
         location.x = x
         location.y = y
         self.locations.append(location)
+        # Matrix is rebuilt lazily once the instance is complete.
+        self.durations = None
+        self.duration_table = None
+        self.graph = None
+
+    def compute_matrices(self, durations=None):
+        # durations may be given when they are stored with the instance.
+        if durations is None:
+            durations = instancefile.compute_durations(
+                    [location.x for location in self.locations],
+                    [location.y for location in self.locations])
+        self.durations = durations
+        self.duration_table = None
+        self.graph = None
+
+    def compute_tables(self):
+        # Plain lists are faster than NumPy scalar indexing in Python loops,
+        # they are built at the first access. Return False if the instance is
+        # too large for them, see instancefile.
+        if self.durations is None:
+            self.compute_matrices()
+        if (len(self.locations)
+                > instancefile.MAXIMUM_NUMBER_OF_LOCATIONS_OF_TABLES):
+            return False
+        if self.duration_table is None:
+            self.duration_table = self.durations.tolist()
+        return True
+
+    def compute_graph(self):
+        from arcgraph import ArcGraph
+        # Feasible arcs between clients, computed once, the graph of each
+        # pricing subproblem is extracted from it.
+        if self.durations is None:
+            self.compute_matrices()
+        self.graph = ArcGraph(
+            [[location.visit_interval] for location in self.locations],
+            self.durations,
+            from_depot=False)
 
     def duration(self, location_id_1, location_id_2):
-        xd = self.locations[location_id_2].x - self.locations[location_id_1].x
-        yd = self.locations[location_id_2].y - self.locations[location_id_1].y
-        d = round(math.sqrt(xd * xd + yd * yd))
-        return d
+        if self.durations is None:
+            # Durations are computed one at a time until the matrix is
+            # needed, checking a certificate only reads a few of them.
+            location_1 = self.locations[location_id_1]
+            location_2 = self.locations[location_id_2]
+            return instancefile.compute_duration(
+                    location_1.x, location_1.y, location_2.x, location_2.y)
+        if self.duration_table is None and not self.compute_tables():
+            return int(self.durations[location_id_1, location_id_2])
+        return self.duration_table[location_id_1][location_id_2]
 
     def write(self, filepath):
         data = {"visit_intervals": [location.visit_interval
@@ -95,14 +146,38 @@ class Instance:
 
 class PricingSolver:
 
-    def __init__(self, instance):
+    def __init__(
+            self,
+            instance,
+            maximum_number_of_columns=10,
+            trace=None,
+            number_of_candidates=None):
+        # The solvers are only imported to solve, checking a certificate
+        # doesn't need them.
+        from columnpool import ColumnPool
         self.instance = instance
+        self.maximum_number_of_columns = maximum_number_of_columns
+        # With number_of_candidates, a client may only be followed by its
+        # nearest clients in the subproblem, the pricing is then heuristic.
+        self.number_of_candidates = number_of_candidates
+        self.candidates = None
+        # Convergence trace, one line per iteration.
+        self.trace = trace
         # TODO START
         self.already_visited : list[Location] = None
+        self.listClient : list[Location] = None
+        self.client_ids = None
+        self.pricing_instance : elp.Instance = None
+        self.forbidden_rows = None
+        # Kept between column generations, for example at each node of the
+        # limited discrepancy search.
+        self.column_pool = ColumnPool()
         # TODO END
 
     def initialize_pricing(self, columns, fixed_columns):
+        import numpy as np
         # TODO START
+        instance = self.instance
         self.already_visited = [False for _ in range(len(instance.locations))]
         self.already_visited[0] = True
         for column_id, column_value in fixed_columns:
@@ -110,71 +185,109 @@ class PricingSolver:
             for row_index, row_coefficient in zip(column.row_indices, column.row_coefficients):
                 if row_coefficient == 1:
                     self.already_visited[row_index] = True
-        # TODO END
+        # Columns of the pool visiting a fixed client can't be used.
+        self.forbidden_rows = np.array(self.already_visited)
+        self.forbidden_rows[0] = False
 
-    def solve_pricing(self, duals):
-        # Build subproblem instance.
-        # TODO START
+        # Build subproblem instance, only its values change between calls.
         depot : Location = instance.locations[0]
-        #depot.visit_interval = [0, 0]
-        listClient : list[Location]= [depot]
+        self.listClient = [depot]
         for i in range(len(instance.locations)):
             if (self.already_visited[i]):
                 continue
-            listClient.append(instance.locations[i])
-        pricing_instance = elp.Instance()
-        for loc in listClient:
-            pricing_instance.add_location(loc.visit_interval, loc.x, loc.y, duals[loc.id])
+            self.listClient.append(instance.locations[i])
+        self.client_ids = np.array([loc.id for loc in self.listClient])
+        self.pricing_instance = elp.Instance()
+        for loc in self.listClient:
+            self.pricing_instance.add_location(loc.visit_interval, loc.x, loc.y, 0)
+        self.pricing_instance.compute_matrices(
+            instance.durations[np.ix_(self.client_ids, self.client_ids)])
+        if self.number_of_candidates is not None:
+            import spatialindex
+            self.candidates = spatialindex.candidate_successors(
+                self.pricing_instance.locations, self.number_of_candidates)
+            graph = self.pricing_instance.candidate_graph(self.candidates)
+        else:
+            if instance.graph is None:
+                instance.compute_graph()
+            graph = instance.graph.subgraph(self.client_ids)
+        self.pricing_instance.set_graph(graph)
+        # TODO END
+        if self.trace is not None:
+            self.trace.initialize(columns, fixed_columns)
 
+    def solve_pricing(self, duals):
+        if self.trace is not None:
+            self.trace.start_iteration(duals, self.column_pool, self.forbidden_rows)
+        columns = self.find_columns(duals)
+        if self.trace is not None:
+            self.trace.end_iteration(len(self.listClient), len(columns))
+        return columns
+
+    def find_columns(self, duals):
+        import numpy as np
+        listClient = self.listClient
+        pricing_instance = self.pricing_instance
+        # Reprice the columns of the pool first, the subproblem is skipped if
+        # they are enough to fill the returned columns.
+        column_ids = self.column_pool.negative_columns(
+            duals, self.forbidden_rows, self.maximum_number_of_columns)
+        if len(column_ids) == self.maximum_number_of_columns:
+            return self.column_pool.use(column_ids)
+
+        # Update subproblem instance.
+        # TODO START
+        pricing_instance.set_values(np.asarray(duals)[self.client_ids])
         # TODO END
 
         # Solve subproblem instance.
         # TODO START
-        res = elp.dynamic_programming(pricing_instance)
+        # The best route ending at each client is computed anyway, all of
+        # them go to the pool and may be used at later iterations.
+        routes = elp.topological_dynamic_programming_routes(
+            pricing_instance, len(listClient))
         # TODO END
 
-        # Retrieve column.
+        # Retrieve columns.
+        for res in routes:
+            self.column_pool.add(self.to_column([listClient[v].id for v in res]))
+        return self.column_pool.use(self.column_pool.negative_columns(
+            duals, self.forbidden_rows, self.maximum_number_of_columns))
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+
+    def to_column(self, route):
+        import columngenerationsolverpy
+        instance = self.instance
         column = columngenerationsolverpy.Column()
         # TODO START
-        column.extra = [listClient[v].id for v in res]
+        column.extra = route
         column.objective_coefficient = 0
-        if res == []:
+        if route == []:
             column.row_indices.append(0)
             column.row_coefficients.append(0)
-            return [column]
+            return column
         u = 0
         column.row_indices.append(u)
         column.row_coefficients.append(1)
-        for i in range(len(res)):
-            v = column.extra[i]
+        for v in route:
             column.row_indices.append(v)
             column.row_coefficients.append(1)
             column.objective_coefficient += instance.duration(u, v)
             u = v
-        column.objective_coefficient += instance.duration(v, depot.id)
-
-        return [column]
-
-
-def reducedcostIdToId(i, j, listClient, duals):
-    id_i = listClient[i].id
-    id_j = listClient[j].id
-    if i == -1:
-        id_i = 0
-    if j == -1:
-        id_j = 0
-    
-    if id_i == 0 and id_j == 0:
-        return 0
-    return instance.duration(id_i, id_j) - .5*(duals[i+1] + duals[j+1])
-
-def feasible_and_improve(i:int, j:int, listClient, old_values, new_values, visited, duals):
-    feasible = i != j and (listClient[i].visit_interval[1] + instance.duration(listClient[i].id, listClient[j].id) <= listClient[j].visit_interval[0])
-    elementary = not j in visited[i]
-    improved = old_values[i] + reducedcostIdToId(i, j, listClient, duals) < new_values[j]
-    return feasible and elementary and improved
-
-def get_parameters(instance: Instance):
+        column.objective_coefficient += instance.duration(v, 0)
+        # TODO END
+        return column
+
+
+def get_parameters(
+        instance: Instance,
+        maximum_number_of_columns=10,
+        trace=None,
+        number_of_candidates=None):
+    import columngenerationsolverpy
     # TODO START
     number_of_constraints = len(instance.locations)
     p = columngenerationsolverpy.Parameters(number_of_constraints)
@@ -193,14 +306,16 @@ def get_parameters(instance: Instance):
             p.row_upper_bounds[i] = 1
             p.row_coefficient_lower_bounds[i] = 0
             p.row_coefficient_upper_bounds[i] = 1
-        values = []
-        for i in range (len(instance.locations)):
-            for j in range (len(instance.locations)):
-                values.append(instance.duration(i, j))
-        p.dummy_column_objective_coefficient = 3*max(values)
+        if instance.durations is None:
+            instance.compute_matrices()
+        p.dummy_column_objective_coefficient = 3 * int(instance.durations.max())
     # TODO END
     # Pricing solver.
-    p.pricing_solver = PricingSolver(instance)
+    if trace is not None:
+        from columngenerationtrace import ColumnGenerationTrace
+        trace = ColumnGenerationTrace(trace, p.dummy_column_objective_coefficient)
+    p.pricing_solver = PricingSolver(
+        instance, maximum_number_of_columns, trace, number_of_candidates)
     return p
 
 
@@ -212,6 +327,41 @@ def to_solution(columns, fixed_columns):
     return solution
 
 
+def solve(
+        instance,
+        algorithm="limited_discrepancy_search",
+        time_budget=math.inf,
+        on_improvement=None,
+        **parameters):
+    """Return the best tours found within time_budget seconds, as an
+    incumbent of anytime.Incumbents. Each improved solution is passed to
+    on_improvement as soon as it is found. The column generation of a node
+    is not interrupted, the budget may be exceeded by its duration.
+
+    algorithm is greedy or limited_discrepancy_search, the other parameters
+    are those of get_parameters.
+
+    """
+    import columngenerationsearch
+    incumbents = anytime.Incumbents(on_improvement, time_budget)
+    # One tour per client is always feasible.
+    clients = instance.locations[1:]
+    incumbents.add(
+        [[location.id] for location in clients],
+        sum(instance.duration(0, location.id)
+            + instance.duration(location.id, 0)
+            for location in clients))
+    if len(instance.locations) <= 1:
+        return incumbents.best
+    p = get_parameters(instance, **parameters)
+    try:
+        columngenerationsearch.column_generation_search(
+            p, algorithm, incumbents, to_solution)
+    finally:
+        p.pricing_solver.close()
+    return incumbents.best
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='')
@@ -229,6 +379,22 @@ if __name__ == "__main__":
             type=str,
             default=None,
             help='')
+    parser.add_argument(
+            "-k", "--maximum-number-of-columns",
+            type=int,
+            default=10,
+            help='maximum number of columns returned by each pricing call')
+    parser.add_argument(
+            "-t", "--trace",
+            type=str,
+            default=None,
+            help='file where the column generation iterations are written')
+    parser.add_argument(
+            "--number-of-candidates",
+            type=int,
+            default=None,
+            help='number of nearest clients which may follow each client '
+                 'in the pricing subproblem')
 
     args = parser.parse_args()
 
@@ -237,13 +403,24 @@ if __name__ == "__main__":
         instance.check(args.certificate)
 
     elif args.algorithm == "column_generation":
+        import columngenerationsolverpy
         instance = Instance(args.instance)
-        output = columngenerationsolverpy.column_generation(
-                get_parameters(instance))
+        parameters = get_parameters(
+                instance,
+                args.maximum_number_of_columns,
+                args.trace,
+                args.number_of_candidates)
+        output = columngenerationsolverpy.column_generation(parameters)
+        parameters.pricing_solver.close()
 
     else:
+        import columngenerationsolverpy
         instance = Instance(args.instance)
-        parameters = get_parameters(instance)
+        parameters = get_parameters(
+                instance,
+                args.maximum_number_of_columns,
+                args.trace,
+                args.number_of_candidates)
         if len(instance.locations) >1:
             if args.algorithm == "greedy":
                 output = columngenerationsolverpy.greedy(
@@ -252,6 +429,7 @@ if __name__ == "__main__":
                 output = columngenerationsolverpy.limited_discrepancy_search(
                         parameters)
             solution = to_solution(parameters.columns, output["solution"])
+            parameters.pricing_solver.close()
         else :
             solution =[]
         if args.certificate is not None:
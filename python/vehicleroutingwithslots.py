@@ -1,7 +1,8 @@
 import json
 import math
-import columngenerationsolverpy
-import treesearchsolverpy
+import time
+import anytime
+import instancefile
 import elementaryshortestpathwithslots as elp
 
 
@@ -16,15 +17,21 @@ class Instance:
 
     def __init__(self, filepath=None):
         self.locations = []
+        self.durations = None
+        self.duration_table = None
+        self.graph = None
         if filepath is not None:
-            with open(filepath) as json_file:
-                data = json.load(json_file)
-                locations = zip(
-                        data["visit_intervals"],
-                        data["xs"],
-                        data["ys"])
-                for (intervals, x, y) in locations:
-                    self.add_location(intervals, x, y)
+            # JSON file or directory of the binary format.
+            data, durations = instancefile.read(filepath)
+            locations = zip(
+                    data["visit_intervals"],
+                    data["xs"],
+                    data["ys"])
+            for (intervals, x, y) in locations:
+                self.add_location(intervals, x, y)
+            # A stored matrix is used, otherwise it is built at first use.
+            if durations is not None:
+                self.compute_matrices(durations)
 
     def add_location(self, visit_intervals, x, y):
         location = Location()
@@ -33,12 +40,55 @@ class Instance:
         location.x = x
         location.y = y
         self.locations.append(location)
+        # Matrix is rebuilt lazily once the instance is complete.
+        self.durations = None
+        self.duration_table = None
+        self.graph = None
+
+    def compute_matrices(self, durations=None):
+        # durations may be given when they are stored with the instance.
+        if durations is None:
+            durations = instancefile.compute_durations(
+                    [location.x for location in self.locations],
+                    [location.y for location in self.locations])
+        self.durations = durations
+        self.duration_table = None
+        self.graph = None
+
+    def compute_tables(self):
+        # Plain lists are faster than NumPy scalar indexing in Python loops,
+        # they are built at the first access. Return False if the instance is
+        # too large for them, see instancefile.
+        if self.durations is None:
+            self.compute_matrices()
+        if (len(self.locations)
+                > instancefile.MAXIMUM_NUMBER_OF_LOCATIONS_OF_TABLES):
+            return False
+        if self.duration_table is None:
+            self.duration_table = self.durations.tolist()
+        return True
+
+    def compute_graph(self):
+        from arcgraph import ArcGraph
+        # Feasible arcs between visits, computed once, the graph of each
+        # pricing subproblem is extracted from it.
+        if self.durations is None:
+            self.compute_matrices()
+        self.graph = ArcGraph(
+            [location.visit_intervals for location in self.locations],
+            self.durations)
 
     def duration(self, location_id_1, location_id_2):
-        xd = self.locations[location_id_2].x - self.locations[location_id_1].x
-        yd = self.locations[location_id_2].y - self.locations[location_id_1].y
-        d = round(math.sqrt(xd * xd + yd * yd))
-        return d
+        if self.durations is None:
+            # Durations are computed one at a time until the matrix is
+            # needed, checking a certificate only reads a few of them.
+            location_1 = self.locations[location_id_1]
+            location_2 = self.locations[location_id_2]
+            return instancefile.compute_duration(
+                    location_1.x, location_1.y, location_2.x, location_2.y)
+        if self.duration_table is None and not self.compute_tables():
+            return int(self.durations[location_id_1, location_id_2])
+        return self.duration_table[location_id_1][location_id_2]
 
     def write(self, filepath):
         data = {"visit_intervals": [location.visit_intervals
@@ -89,72 +139,298 @@ class Instance:
             return (is_feasible, objective_value)
 
 
+# Pricing algorithms, from the cheapest to the exact one. The next one is only
+# run if the previous ones found no column with a negative reduced cost.
+PRICING_CASCADE = [
+        ("greedy", {}),
+        ("iterative_beam_search", {"maximum_size_of_the_queue": 64}),
+        ("best_first_search", {})]
+
+
+def pricing_branching_scheme(instance, client_ids, number_of_candidates=None):
+    import numpy as np
+    # Subproblem restricted to client_ids, its values are set at each call.
+    # With number_of_candidates, a client may only be followed by its nearest
+    # clients, the pricing is then heuristic.
+    pricing_instance = elp.Instance()
+    for location_id in client_ids.tolist():
+        loc = instance.locations[location_id]
+        pricing_instance.add_location(loc.visit_intervals, loc.x, loc.y, 0)
+    pricing_instance.compute_matrices(
+            instance.durations[np.ix_(client_ids, client_ids)])
+    candidates = None
+    if number_of_candidates is not None:
+        import spatialindex
+        # The branching scheme builds the arcs of the candidates only.
+        candidates = spatialindex.candidate_successors(
+                pricing_instance.locations, number_of_candidates)
+    else:
+        if instance.graph is None:
+            instance.compute_graph()
+        pricing_instance.graph = instance.graph.subgraph(client_ids)
+    return elp.BranchingScheme(pricing_instance, candidates=candidates)
+
+
+def solve_pricing_subproblem(
+        bs, maximum_number_of_columns, time_limit, label_setting=False):
+    # The solvers are only imported to solve, checking a certificate doesn't
+    # need them.
+    import columngenerationsolverpy
+    import treesearchsolverpy
+    if label_setting:
+        # Exact, the best routes of negative reduced cost.
+        return elp.label_setting(
+                bs,
+                maximum_number_of_columns,
+                maximum_cost=-columngenerationsolverpy.TOL,
+                time_limit=time_limit)["routes"]
+    # Early iterations usually stop after the greedy, the whole time limit is
+    # only spent by the exact search near convergence.
+    start = time.time()
+    for algorithm, parameters in PRICING_CASCADE:
+        output = getattr(treesearchsolverpy, algorithm)(
+                bs,
+                maximum_pool_size=maximum_number_of_columns,
+                time_limit=time_limit - (time.time() - start),
+                verbose=False,
+                **parameters)
+        solution_pool = output["solution_pool"]
+        if solution_pool.best.cost <= -columngenerationsolverpy.TOL:
+            break
+    return [bs.to_solution(node) for node in solution_pool.solutions]
+
+
 class PricingSolver:
 
-    def __init__(self, instance):
+    def __init__(
+            self,
+            instance,
+            maximum_number_of_columns=10,
+            time_limit=10,
+            trace=None,
+            number_of_candidates=None,
+            label_setting=False):
+        from columnpool import ColumnPool
         self.instance = instance
+        self.maximum_number_of_columns = maximum_number_of_columns
+        self.time_limit = time_limit
+        self.number_of_candidates = number_of_candidates
+        # Solve the subproblems with the exact label-setting algorithm
+        # instead of the tree search cascade.
+        self.label_setting = label_setting
+        # Convergence trace, one line per iteration.
+        self.trace = trace
         # TODO START
         self.already_visited : list[Location] = None
+        self.listClient : list[Location] = None
+        self.client_ids = None
+        self.branching_scheme = None
+        self.forbidden_rows = None
+        # Kept between column generations, for example at each node of the
+        # limited discrepancy search.
+        self.column_pool = ColumnPool()
         # TODO END
 
     def initialize_pricing(self, columns, fixed_columns):
+        import numpy as np
         # TODO START
+        instance = self.instance
         self.already_visited = [0 for _ in range(len(instance.locations))]
         self.already_visited[0] = 1
         for column_id, column_value in fixed_columns:
             column = columns[column_id]
             for row_index, row_coefficient in zip(column.row_indices, column.row_coefficients):
                 self.already_visited[row_index] += column_value*row_coefficient
-        # TODO END
+        # Columns of the pool visiting a fixed client can't be used.
+        self.forbidden_rows = np.array(self.already_visited) != 0
+        self.forbidden_rows[0] = False
 
-    def solve_pricing(self, duals):
-        # Build subproblem instance.
-        # TODO START
         depot = instance.locations[0]
-        listClient : list[Location] = [depot]
+        self.listClient = [depot]
         for i in range(len(instance.locations)):
             if (self.already_visited[i] != 0):
                 continue
-            listClient.append( instance.locations[i])
-        nbClient = len(listClient)
-        if nbClient == 0 :
-            return []
-        pricing_instance = elp.Instance()
-        for loc in listClient:
-            pricing_instance.add_location(loc.visit_intervals, loc.x, loc.y, duals[loc.id])
+            self.listClient.append(instance.locations[i])
+        self.client_ids = np.array([loc.id for loc in self.listClient])
+        self.initialize_subproblem()
+        # TODO END
+        if self.trace is not None:
+            self.trace.initialize(columns, fixed_columns)
+
+    def initialize_subproblem(self):
+        # Build subproblem instance and its arcs, only its values change
+        # between calls.
+        self.branching_scheme = pricing_branching_scheme(
+                self.instance, self.client_ids, self.number_of_candidates)
+
+    def solve_pricing(self, duals):
+        if self.trace is not None:
+            self.trace.start_iteration(
+                    duals, self.column_pool, self.forbidden_rows)
+        columns = self.find_columns(duals)
+        if self.trace is not None:
+            self.trace.end_iteration(len(self.listClient), len(columns))
+        return columns
+
+    def find_columns(self, duals):
+        # Reprice the columns of the pool first, the subproblem is skipped if
+        # they are enough to fill the returned columns.
+        column_ids = self.column_pool.negative_columns(
+                duals, self.forbidden_rows, self.maximum_number_of_columns)
+        if len(column_ids) == self.maximum_number_of_columns:
+            return self.column_pool.use(column_ids)
 
+        # Retrieve columns.
+        for route in self.solve_subproblem(duals):
+            self.column_pool.add(self.to_column(route))
+        return self.column_pool.use(self.column_pool.negative_columns(
+                duals, self.forbidden_rows, self.maximum_number_of_columns))
+
+    def solve_subproblem(self, duals):
+        import numpy as np
+        # Update subproblem instance.
+        # TODO START
+        bs = self.branching_scheme
+        bs.instance.set_values(np.asarray(duals)[self.client_ids])
+        bs.update_costs()
         # TODO END
 
         # Solve subproblem instance.
         # TODO START
-        bs = elp.BranchingScheme(pricing_instance)
-        output = treesearchsolverpy.iterative_beam_search(bs, time_limit=10, verbose=False)
-        res = bs.to_solution(output["solution_pool"].best)
+        routes = solve_pricing_subproblem(
+                bs,
+                self.maximum_number_of_columns,
+                self.time_limit,
+                self.label_setting)
+        return [[self.listClient[v].id for v in route] for route in routes]
         # TODO END
 
-        # Retrieve column.
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+
+    def to_column(self, route):
+        import columngenerationsolverpy
+        instance = self.instance
         column = columngenerationsolverpy.Column()
         # TODO START
-        column.extra = [listClient[v].id for v in res]
+        column.extra = route
         column.objective_coefficient = 0
-        if res == []:
-            return [column]
+        if route == []:
+            return column
         u = 0
         column.row_indices.append(u)
         column.row_coefficients.append(1)
-        for i in range(len(res)):
-            v = column.extra[i]
+        for v in route:
             column.row_indices.append(v)
             column.row_coefficients.append(1)
             column.objective_coefficient += instance.duration(u, v)
             u = v
-        column.objective_coefficient += instance.duration(v, depot.id)
+        column.objective_coefficient += instance.duration(v, 0)
         # TODO END
+        return column
+
+
+# State of a pricing worker process. The instance is sent once when the
+# worker starts, the subproblem is only rebuilt when the clients change.
+pricing_worker = {}
 
-        return [column]
 
+def initialize_pricing_worker(
+        instance,
+        maximum_number_of_columns,
+        time_limit,
+        number_of_candidates,
+        label_setting):
+    pricing_worker["instance"] = instance
+    pricing_worker["maximum_number_of_columns"] = maximum_number_of_columns
+    pricing_worker["time_limit"] = time_limit
+    pricing_worker["number_of_candidates"] = number_of_candidates
+    pricing_worker["label_setting"] = label_setting
+    pricing_worker["client_ids"] = None
+    pricing_worker["branching_scheme"] = None
 
-def get_parameters(instance):
+
+def solve_pricing_worker(client_ids, duals, worker_id, number_of_workers):
+    import numpy as np
+    if (pricing_worker["client_ids"] is None
+            or not np.array_equal(pricing_worker["client_ids"], client_ids)):
+        pricing_worker["client_ids"] = client_ids
+        pricing_worker["branching_scheme"] = pricing_branching_scheme(
+                pricing_worker["instance"],
+                client_ids,
+                pricing_worker["number_of_candidates"])
+    bs = pricing_worker["branching_scheme"]
+    bs.instance.set_values(np.asarray(duals)[client_ids])
+    bs.update_costs()
+    # This worker only explores the routes starting with its share of the
+    # clients.
+    bs.root_successors = bs.root_successors[worker_id::number_of_workers]
+    routes = solve_pricing_subproblem(
+            bs,
+            pricing_worker["maximum_number_of_columns"],
+            pricing_worker["time_limit"],
+            pricing_worker["label_setting"])
+    return [[int(client_ids[v]) for v in route] for route in routes]
+
+
+class ParallelPricingSolver(PricingSolver):
+
+    def __init__(
+            self,
+            instance,
+            number_of_workers,
+            maximum_number_of_columns=10,
+            time_limit=10,
+            trace=None,
+            number_of_candidates=None,
+            label_setting=False):
+        super().__init__(
+                instance,
+                maximum_number_of_columns,
+                time_limit,
+                trace,
+                number_of_candidates,
+                label_setting)
+        import multiprocessing
+        self.number_of_workers = number_of_workers
+        self.pool = multiprocessing.Pool(
+                number_of_workers,
+                initializer=initialize_pricing_worker,
+                initargs=(
+                    instance,
+                    maximum_number_of_columns,
+                    time_limit,
+                    number_of_candidates,
+                    label_setting))
+
+    def initialize_subproblem(self):
+        # The subproblems are built by the workers.
+        pass
+
+    def solve_subproblem(self, duals):
+        duals = list(duals)
+        results = self.pool.starmap(
+                solve_pricing_worker,
+                [(self.client_ids, duals, worker_id, self.number_of_workers)
+                 for worker_id in range(self.number_of_workers)])
+        return [route for routes in results for route in routes]
+
+    def close(self):
+        super().close()
+        self.pool.close()
+        self.pool.join()
+
+
+def get_parameters(
+        instance,
+        maximum_number_of_columns=10,
+        time_limit=10,
+        number_of_workers=1,
+        trace=None,
+        number_of_candidates=None,
+        label_setting=False):
+    import columngenerationsolverpy
     # TODO START
     number_of_constraints = len(instance.locations)
     p = columngenerationsolverpy.Parameters(number_of_constraints)
@@ -173,14 +449,39 @@ def get_parameters(instance):
             p.row_upper_bounds[i] = 1
             p.row_coefficient_lower_bounds[i] = 0
             p.row_coefficient_upper_bounds[i] = 1
-        values = []
-        for i in range (len(instance.locations)):
-            for j in range (len(instance.locations)):
-                values.append(instance.duration(i, j))
-        p.dummy_column_objective_coefficient = 3*max(values)
+        if instance.durations is None:
+            instance.compute_matrices()
+        p.dummy_column_objective_coefficient = 3 * int(instance.durations.max())
     # TODO END
     # Pricing solver.
-    p.pricing_solver = PricingSolver(instance)
+    if trace is not None:
+        from columngenerationtrace import ColumnGenerationTrace
+        trace = ColumnGenerationTrace(
+                trace, p.dummy_column_objective_coefficient)
+    if number_of_workers > 1:
+        p.pricing_solver = ParallelPricingSolver(
+                instance,
+                number_of_workers,
+                maximum_number_of_columns,
+                time_limit,
+                trace,
+                number_of_candidates,
+                label_setting)
+    else:
+        p.pricing_solver = PricingSolver(
+                instance,
+                maximum_number_of_columns,
+                time_limit,
+                trace,
+                number_of_candidates,
+                label_setting)
+    # Routes of the pricing subproblem leave the depot at time 0, a client
+    # which can't be reached in time by any of them is covered by a tour of
+    # its own, which may start earlier.
+    for location in instance.locations[1:]:
+        if all(instance.duration(0, location.id) > interval[0]
+               for interval in location.visit_intervals):
+            p.columns.append(p.pricing_solver.to_column([location.id]))
     return p
 
 
@@ -194,6 +495,44 @@ def to_solution(columns, fixed_columns):
     return solution
 
 
+def solve(
+        instance,
+        algorithm="limited_discrepancy_search",
+        time_budget=math.inf,
+        on_improvement=None,
+        **parameters):
+    """Return the best tours found within time_budget seconds, as an
+    incumbent of anytime.Incumbents. Each improved solution is passed to
+    on_improvement as soon as it is found. The column generation of a node
+    is not interrupted, the budget may be exceeded by its duration.
+
+    algorithm is greedy or limited_discrepancy_search, the other parameters
+    are those of get_parameters. The time limit of each pricing subproblem is
+    at most the time budget.
+
+    """
+    import columngenerationsearch
+    incumbents = anytime.Incumbents(on_improvement, time_budget)
+    # One tour per client is always feasible.
+    clients = instance.locations[1:]
+    incumbents.add(
+            [[location.id] for location in clients],
+            sum(instance.duration(0, location.id)
+                + instance.duration(location.id, 0)
+                for location in clients))
+    if len(instance.locations) <= 1:
+        return incumbents.best
+    parameters["time_limit"] = min(
+            parameters.get("time_limit", 10), time_budget)
+    p = get_parameters(instance, **parameters)
+    try:
+        columngenerationsearch.column_generation_search(
+                p, algorithm, incumbents, to_solution)
+    finally:
+        p.pricing_solver.close()
+    return incumbents.best
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='')
@@ -211,6 +550,31 @@ if __name__ == "__main__":
             type=str,
             default=None,
             help='')
+    parser.add_argument(
+            "-k", "--maximum-number-of-columns",
+            type=int,
+            default=10,
+            help='maximum number of columns returned by each pricing call')
+    parser.add_argument(
+            "-w", "--number-of-workers",
+            type=int,
+            default=1,
+            help='number of processes solving the pricing problem')
+    parser.add_argument(
+            "-t", "--trace",
+            type=str,
+            default=None,
+            help='file where the column generation iterations are written')
+    parser.add_argument(
+            "--number-of-candidates",
+            type=int,
+            default=None,
+            help='number of nearest clients which may follow each client '
+                 'in the pricing subproblem')
+    parser.add_argument(
+            "--label-setting",
+            action="store_true",
+            help='solve the pricing subproblem exactly by label setting')
 
     args = parser.parse_args()
 
@@ -237,19 +601,35 @@ if __name__ == "__main__":
                     args.instance + "_" + str(number_of_locations) + ".json")
 
     elif args.algorithm == "column_generation":
+        import columngenerationsolverpy
         instance = Instance(args.instance)
-        output = columngenerationsolverpy.column_generation(
-                get_parameters(instance))
+        parameters = get_parameters(
+                instance,
+                args.maximum_number_of_columns,
+                number_of_workers=args.number_of_workers,
+                trace=args.trace,
+                number_of_candidates=args.number_of_candidates,
+                label_setting=args.label_setting)
+        output = columngenerationsolverpy.column_generation(parameters)
+        parameters.pricing_solver.close()
 
     else:
+        import columngenerationsolverpy
         instance = Instance(args.instance)
-        parameters = get_parameters(instance)
+        parameters = get_parameters(
+                instance,
+                args.maximum_number_of_columns,
+                number_of_workers=args.number_of_workers,
+                trace=args.trace,
+                number_of_candidates=args.number_of_candidates,
+                label_setting=args.label_setting)
         if args.algorithm == "greedy":
             output = columngenerationsolverpy.greedy(
                     parameters)
         elif args.algorithm == "limited_discrepancy_search":
             output = columngenerationsolverpy.limited_discrepancy_search(
                     parameters)
+        parameters.pricing_solver.close()
         solution = to_solution(parameters.columns, output["solution"])
         if args.certificate is not None:
             data = {"locations": solution}
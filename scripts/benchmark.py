@@ -0,0 +1,304 @@
+"""Benchmark the solvers against the baseline of results/benchmark.json.
+
+Each case (program, algorithm, instance) is run in a fresh process, which
+reports its wall time, its peak resident memory and the objective it found.
+A case is a regression when its time or its memory exceeds the baseline by
+more than the threshold, or when its objective is worse.
+
+The time of the commands of python/cli.py which don't solve, the checkers and
+the generator, is measured as well. It is compared to a fixed budget, over the
+startup time of the interpreter, instead of the baseline. They are also run
+with python -X importtime, and a case is a regression if they import a solver
+package, or NumPy for the checkers.
+
+Usage: python benchmark.py [-t dp ts cgdp cgts] [--threshold 0.2]
+       python benchmark.py --update-baseline
+
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PYTHON = os.path.join(ROOT, "python")
+BASELINE = os.path.join(ROOT, "results", "benchmark.json")
+
+# Program, data directory, algorithms and instance sizes of each type.
+TYPES = {
+        "dp": (
+            "elementaryshortestpathwithsingleslot",
+            "elementaryshortestpathwithslots",
+            ["dynamic_programming", "topological_dynamic_programming"],
+            [25, 50, 100]),
+        "ts": (
+            "elementaryshortestpathwithslots",
+            "elementaryshortestpathwithslots",
+            ["greedy", "iterative_beam_search", "best_first_search",
+             "label_setting"],
+            [25, 50, 100]),
+        "cgdp": (
+            "vehicleroutingwithsingleslot",
+            "vehicleroutingwithslots",
+            ["column_generation"],
+            [20, 40, 60]),
+        "cgts": (
+            "vehicleroutingwithslots",
+            "vehicleroutingwithslots",
+            ["column_generation"],
+            [20, 40, 60])}
+
+# Results directory of each type, its certificates are checked by the
+# startup cases.
+RESULTS = {
+        "dp": "dynamicprogramming",
+        "ts": "treesearch",
+        "cgdp": "columnsdynamicprogramming",
+        "cgts": "columnstreesearch"}
+
+# Time budget in seconds, over the startup time of the interpreter, of the
+# commands of python/cli.py which don't solve, and the packages they must not
+# import. The checkers don't import NumPy, the generator draws the instances
+# with it.
+STARTUP_BUDGETS = {
+        "checker": 0.1,
+        "generator": 0.25,
+        "dp": 0.075,
+        "ts": 0.075,
+        "cgdp": 0.075,
+        "cgts": 0.075}
+SOLVER_PACKAGES = ["treesearchsolverpy", "columngenerationsolverpy", "pulp"]
+CHECKER_PACKAGES = SOLVER_PACKAGES + ["numpy"]
+
+
+def solve(result_type, algorithm, instance_number):
+    sys.path.insert(0, PYTHON)
+    module_name, data_type, _, _ = TYPES[result_type]
+    module = __import__(module_name)
+    instance_path = os.path.join(
+            ROOT, "data", data_type, f"instance_{instance_number}.json")
+
+    # The programs import their dependencies at first use, they are imported
+    # before the timer starts, so that only the solve is measured.
+    for name in ["numpy", "arcgraph", "spatialindex", "columngenerationtrace"]:
+        __import__(name)
+
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        objective = run(module, result_type, algorithm, instance_path)
+    elapsed_time = time.time() - start
+
+    return {
+            "time": elapsed_time,
+            # ru_maxrss is in kilobytes on Linux.
+            "memory": resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "objective": objective}
+
+
+def run(module, result_type, algorithm, instance_path):
+    instance = module.Instance(instance_path)
+    if result_type == "dp":
+        route = getattr(module, algorithm)(instance)
+        locations = [0] + route + [0]
+        objective = sum(
+                instance.cost(location_id_1, location_id_2)
+                for location_id_1, location_id_2
+                in zip(locations, locations[1:]))
+    elif result_type == "ts" and algorithm == "label_setting":
+        branching_scheme = module.BranchingScheme(instance)
+        output = module.label_setting(branching_scheme, time_limit=30)
+        objective = output["costs"][0]
+    elif result_type == "ts":
+        import treesearchsolverpy
+        branching_scheme = module.BranchingScheme(instance)
+        output = getattr(treesearchsolverpy, algorithm)(
+                branching_scheme, time_limit=30)
+        objective = output["solution_pool"].best.cost
+    else:
+        import columngenerationsolverpy
+        parameters = module.get_parameters(instance)
+        output = getattr(columngenerationsolverpy, algorithm)(
+                parameters, verbose=False)
+        if hasattr(parameters.pricing_solver, "close"):
+            parameters.pricing_solver.close()
+        objective = output["solution_value"]
+    return objective
+
+
+def run_case(case, repeat):
+    # A new process for each run, so that peak memory is not shared
+    # between cases.
+    results = []
+    for _ in range(repeat):
+        with multiprocessing.Pool(1) as pool:
+            results.append(pool.apply(solve, case))
+    return {
+            "time": min(result["time"] for result in results),
+            "memory": max(result["memory"] for result in results),
+            "objective": results[0]["objective"]}
+
+
+def startup_arguments(command, directory):
+    # Arguments of a run of the command which doesn't solve, its outputs are
+    # written to directory.
+    if command == "checker":
+        return ["-r", os.path.join(ROOT, "results"),
+                "-d", os.path.join(ROOT, "data"),
+                "-t", "treesearch",
+                "-o", os.path.join(directory, "checks.json")]
+    if command == "generator":
+        return ["-o", os.path.join(directory, "instance"),
+                "-n", "100",
+                "-p", "vehicle_routing"]
+    _, data_type, _, _ = TYPES[command]
+    return ["-a", "checker",
+            "-i", os.path.join(ROOT, "data", data_type, "instance_20.json"),
+            "-c", os.path.join(
+                ROOT, "results", RESULTS[command], "instance_20.json")]
+
+
+def run_startup(command, repeat):
+    # The time of the command is measured over the time of an interpreter
+    # which does nothing, the best of the runs of each is kept.
+    times = []
+    interpreter_times = []
+    with tempfile.TemporaryDirectory() as directory:
+        arguments = (
+                [sys.executable, os.path.join(PYTHON, "cli.py"), command]
+                + startup_arguments(command, directory))
+        for _ in range(repeat):
+            start = time.time()
+            subprocess.run([sys.executable, "-c", "pass"], check=True)
+            interpreter_times.append(time.time() - start)
+            start = time.time()
+            subprocess.run(arguments, stdout=subprocess.DEVNULL, check=True)
+            times.append(time.time() - start)
+        # Each imported module is reported on a line "import time: self |
+        # cumulative | name" of the standard error.
+        output = subprocess.run(
+                [arguments[0], "-X", "importtime"] + arguments[1:],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                check=True)
+    imported = {line.split("|")[-1].strip().split(".")[0]
+                for line in output.stderr.splitlines()
+                if line.startswith("import time:")}
+    forbidden = SOLVER_PACKAGES if command == "generator" else CHECKER_PACKAGES
+    return {"time": min(times) - min(interpreter_times),
+            "forbidden_imports": sorted(imported & set(forbidden))}
+
+
+def compare_startup(result, budget):
+    regressions = []
+    if result["time"] > budget:
+        regressions.append("time")
+    if result["forbidden_imports"]:
+        regressions.append(
+                "imports " + ", ".join(result["forbidden_imports"]))
+    return regressions
+
+
+def compare(result, baseline, threshold):
+    regressions = []
+    # Differences of a few hundredths of a second are timer noise.
+    if result["time"] > baseline["time"] * (1 + threshold) + 0.05:
+        regressions.append("time")
+    if result["memory"] > baseline["memory"] * (1 + threshold):
+        regressions.append("memory")
+    if result["objective"] > baseline["objective"] + 1e-6:
+        regressions.append("objective")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-t", "--types",
+            type=str,
+            nargs="+",
+            choices=list(TYPES),
+            default=list(TYPES),
+            help='')
+    parser.add_argument(
+            "-r", "--repeat",
+            type=int,
+            default=3,
+            help='number of runs of each case, the best time is kept')
+    parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help='relative increase of time or memory reported as a '
+                 'regression')
+    parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help='')
+    parser.add_argument(
+            "--skip-startup",
+            action="store_true",
+            help='don\'t measure the startup time of the commands')
+
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as json_file:
+            baseline = json.load(json_file)
+
+    results = {}
+    number_of_regressions = 0
+    print(f"{'Case':<48}{'Time (s)':>10}{'Base':>10}"
+          f"{'Mem (MB)':>10}{'Base':>10}{'Objective':>12}{'Base':>12}")
+    for result_type in args.types:
+        _, _, algorithms, instance_numbers = TYPES[result_type]
+        for algorithm in algorithms:
+            for instance_number in instance_numbers:
+                name = f"{result_type}/{algorithm}/{instance_number}"
+                result = run_case(
+                        (result_type, algorithm, instance_number),
+                        args.repeat)
+                results[name] = result
+                line = f"{name:<48}{result['time']:>10.3f}"
+                if name not in baseline:
+                    print(f"{line}{'':>10}{result['memory']:>10.1f}{'':>10}"
+                          f"{result['objective']:>12.6g}")
+                    continue
+                base = baseline[name]
+                regressions = compare(result, base, args.threshold)
+                number_of_regressions += len(regressions)
+                print(f"{line}{base['time']:>10.3f}"
+                      f"{result['memory']:>10.1f}{base['memory']:>10.1f}"
+                      f"{result['objective']:>12.6g}{base['objective']:>12.6g}"
+                      + ("  REGRESSION: " + ", ".join(regressions)
+                         if regressions else ""))
+
+    # The Base column of the startup cases is their budget, they are not
+    # stored in the baseline.
+    for command in ([] if args.skip_startup else STARTUP_BUDGETS):
+        name = f"startup/{command}"
+        result = run_startup(command, args.repeat)
+        regressions = compare_startup(result, STARTUP_BUDGETS[command])
+        number_of_regressions += len(regressions)
+        print(f"{name:<48}{result['time']:>10.3f}"
+              f"{STARTUP_BUDGETS[command]:>10.3f}"
+              + ("  REGRESSION: " + ", ".join(regressions)
+                 if regressions else ""))
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE, 'w') as json_file:
+            json.dump(baseline, json_file, indent=4)
+    elif number_of_regressions > 0:
+        print(f"\n{number_of_regressions} regression(s).")
+        sys.exit(1)
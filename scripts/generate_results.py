@@ -0,0 +1,202 @@
+"""Generate the certificates of results/ in parallel.
+
+Each job runs one solver on one instance in its own process, so that it can
+be stopped at its time limit and bounded in memory. The certificates are then
+checked with the Instance.check of the solver and a summary with the wall
+time, the feasibility and the cost of each job is written next to them in
+results/<type>/summary.json.
+
+Usage: python generate_results.py [-t dp ts cgdp cgts] [-i 0-100] [-w 4]
+
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import importlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PYTHON = os.path.join(ROOT, "python")
+
+# Program, data and results directories and default algorithm of each type.
+TYPES = {
+        "dp": (
+            "elementaryshortestpathwithsingleslot",
+            "elementaryshortestpathwithslots",
+            "dynamicprogramming",
+            "dynamic_programming"),
+        "ts": (
+            "elementaryshortestpathwithslots",
+            "elementaryshortestpathwithslots",
+            "treesearch",
+            "iterative_beam_search"),
+        "cgdp": (
+            "vehicleroutingwithsingleslot",
+            "vehicleroutingwithslots",
+            "columnsdynamicprogramming",
+            "limited_discrepancy_search"),
+        "cgts": (
+            "vehicleroutingwithslots",
+            "vehicleroutingwithslots",
+            "columnstreesearch",
+            "limited_discrepancy_search")}
+
+
+def parse_instances(value):
+    instances = []
+    for part in value.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            instances += range(int(first), int(last) + 1)
+        else:
+            instances.append(int(part))
+    return instances
+
+
+def run_job(job, algorithm, time_limit, memory_limit):
+    result_type, instance_number = job
+    module, data_type, results_type, _ = TYPES[result_type]
+    instance_path = os.path.join(
+            ROOT, "data", data_type, f"instance_{instance_number}.json")
+    certificate_path = os.path.join(
+            ROOT, "results", results_type, f"instance_{instance_number}.json")
+    command = [
+            sys.executable, os.path.join(PYTHON, module + ".py"),
+            "-a", algorithm,
+            "-i", instance_path,
+            "-c", certificate_path]
+    start = time.time()
+    error = None
+    # Jobs are started from threads, where preexec_fn may deadlock, so the
+    # memory limit is set on the started process instead.
+    process = subprocess.Popen(
+            command,
+            cwd=PYTHON,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE)
+    if memory_limit is not None:
+        limit = memory_limit * 1024 * 1024
+        with contextlib.suppress(ProcessLookupError):
+            resource.prlimit(process.pid, resource.RLIMIT_AS, (limit, limit))
+    try:
+        _, stderr = process.communicate(timeout=time_limit)
+        if process.returncode == 0:
+            status = "ok"
+        elif memory_limit is not None:
+            # Allocations beyond the limit don't always raise a MemoryError,
+            # NumPy may abort instead.
+            status = "memory limit or error"
+        else:
+            status = "error"
+        if process.returncode != 0:
+            error = (stderr.decode().strip().split("\n")[-1]
+                     or f"exit status {process.returncode}")
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        status = "time limit"
+    summary = {
+            "algorithm": algorithm,
+            "status": status,
+            "time": time.time() - start}
+    if error is not None:
+        summary["error"] = error
+    return summary
+
+
+def check(job):
+    result_type, instance_number = job
+    module, data_type, results_type, _ = TYPES[result_type]
+    module = importlib.import_module(module)
+    instance = module.Instance(os.path.join(
+            ROOT, "data", data_type, f"instance_{instance_number}.json"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return instance.check(os.path.join(
+                ROOT, "results", results_type,
+                f"instance_{instance_number}.json"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-t", "--types",
+            type=str,
+            nargs="+",
+            choices=list(TYPES),
+            default=list(TYPES),
+            help='')
+    parser.add_argument(
+            "-i", "--instances",
+            type=parse_instances,
+            default=list(range(101)),
+            help='instance numbers, for example 0-100 or 1,5,10-20')
+    parser.add_argument(
+            "-a", "--algorithm",
+            type=str,
+            action="append",
+            default=[],
+            help='algorithm of a type, for example cgts=greedy')
+    parser.add_argument(
+            "-w", "--number-of-workers",
+            type=int,
+            default=os.cpu_count(),
+            help='')
+    parser.add_argument(
+            "--time-limit",
+            type=float,
+            default=None,
+            help='time limit of each job in seconds')
+    parser.add_argument(
+            "--memory-limit",
+            type=int,
+            default=None,
+            help='memory limit of each job in MB')
+
+    args = parser.parse_args()
+
+    algorithms = {result_type: TYPES[result_type][3] for result_type in TYPES}
+    for value in args.algorithm:
+        result_type, algorithm = value.split("=")
+        algorithms[result_type] = algorithm
+
+    sys.path.insert(0, PYTHON)
+    jobs = [(result_type, instance_number)
+            for result_type in args.types
+            for instance_number in args.instances]
+    summaries = {result_type: {} for result_type in args.types}
+    with concurrent.futures.ThreadPoolExecutor(
+            args.number_of_workers) as executor:
+        futures = {
+                executor.submit(
+                    run_job,
+                    job,
+                    algorithms[job[0]],
+                    args.time_limit,
+                    args.memory_limit): job
+                for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            job = futures[future]
+            summary = future.result()
+            if summary["status"] == "ok":
+                summary["feasible"], summary["cost"] = check(job)
+            summaries[job[0]][str(job[1])] = summary
+            print(f"{job[0]:<5} {job[1]:>4} {summary['status']:<22}"
+                  f"{summary['time']:>9.3f}s  {summary.get('cost', '')}")
+
+    # Merge with the summaries of previous runs.
+    for result_type, summary in summaries.items():
+        summary_path = os.path.join(
+                ROOT, "results", TYPES[result_type][2], "summary.json")
+        if os.path.exists(summary_path):
+            with open(summary_path) as json_file:
+                summary = {**json.load(json_file), **summary}
+        summary = dict(sorted(summary.items(), key=lambda item: int(item[0])))
+        with open(summary_path, 'w') as json_file:
+            json.dump(summary, json_file, indent=4)
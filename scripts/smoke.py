@@ -0,0 +1,159 @@
+"""Check that generated instances are solved by every program.
+
+Instances of several sizes and numbers of slots are generated with
+python/instancegenerator.py in a temporary directory. Each algorithm of each
+program is run on them, and its certificate is checked with python/checker.py.
+A case fails when the program exits with an error, writes no certificate or
+an infeasible one.
+
+Usage: python smoke.py [-n 2 8 20] [-s 1 2 3] [-f json binary]
+
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PYTHON = os.path.join(ROOT, "python")
+
+# Problem of the generated instances, algorithms and results directory of
+# each program, the checker rules are those of the results directory.
+PROGRAMS = {
+        "dp": (
+            "elementary_shortest_path",
+            ["dynamic_programming", "topological_dynamic_programming"],
+            "dynamicprogramming"),
+        "ts": (
+            "elementary_shortest_path",
+            ["greedy", "iterative_beam_search", "best_first_search",
+             "label_setting"],
+            "treesearch"),
+        "cgdp": (
+            "vehicle_routing",
+            ["greedy", "limited_discrepancy_search"],
+            "columnsdynamicprogramming"),
+        "cgts": (
+            "vehicle_routing",
+            ["greedy", "limited_discrepancy_search"],
+            "columnstreesearch")}
+
+
+def generate(directory, problem, number_of_slots, file_format, sizes):
+    prefix = os.path.join(
+            directory, f"{problem}_{number_of_slots}_{file_format}")
+    output = subprocess.run(
+            [sys.executable, os.path.join(PYTHON, "instancegenerator.py"),
+             "-o", prefix,
+             "-n"] + [str(size) for size in sizes] + [
+             "-p", problem,
+             "-s", str(number_of_slots),
+             "-f", file_format],
+            capture_output=True,
+            text=True,
+            check=True)
+    return output.stdout.split()
+
+
+def run_case(program, algorithm, instance_path, certificate_path, time_limit):
+    """Return None if the certificate is feasible, the reason of the failure
+    otherwise."""
+    import checker
+    _, _, results_type = PROGRAMS[program]
+    _, vehicle_routing, single_slot = checker.RESULTS[results_type]
+    try:
+        output = subprocess.run(
+                [sys.executable, os.path.join(PYTHON, "cli.py"), program,
+                 "-a", algorithm,
+                 "-i", instance_path,
+                 "-c", certificate_path],
+                capture_output=True,
+                text=True,
+                timeout=time_limit)
+    except subprocess.TimeoutExpired:
+        return "timeout"
+    if output.returncode != 0:
+        return output.stderr.strip().splitlines()[-1]
+    if not os.path.exists(certificate_path):
+        return "no certificate"
+    with open(certificate_path) as json_file:
+        data = json.load(json_file)
+    result = checker.check_certificate(
+            checker.Instance(instance_path), data, vehicle_routing, single_slot)
+    if not result["feasible"]:
+        return f"infeasible certificate {result}"
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-p", "--programs",
+            type=str,
+            nargs="+",
+            choices=list(PROGRAMS),
+            default=list(PROGRAMS),
+            help='')
+    parser.add_argument(
+            "-n", "--number-of-locations",
+            type=int,
+            nargs="+",
+            default=[2, 8, 20],
+            help='sizes of the generated instances')
+    parser.add_argument(
+            "-s", "--number-of-slots",
+            type=int,
+            nargs="+",
+            default=[1, 2, 3],
+            help='')
+    parser.add_argument(
+            "-f", "--formats",
+            type=str,
+            nargs="+",
+            choices=["json", "binary"],
+            default=["json", "binary"],
+            help='')
+    parser.add_argument(
+            "--time-limit",
+            type=float,
+            default=60,
+            help='time limit of each run in seconds')
+
+    args = parser.parse_args()
+
+    sys.path.insert(0, PYTHON)
+    number_of_failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        certificate_path = os.path.join(directory, "certificate.json")
+        for problem in sorted({PROGRAMS[program][0]
+                               for program in args.programs}):
+            for number_of_slots in args.number_of_slots:
+                for file_format in args.formats:
+                    instance_paths = generate(
+                            directory, problem, number_of_slots, file_format,
+                            args.number_of_locations)
+                    for program in args.programs:
+                        program_problem, algorithms, _ = PROGRAMS[program]
+                        if program_problem != problem:
+                            continue
+                        for algorithm in algorithms:
+                            for instance_path in instance_paths:
+                                if os.path.exists(certificate_path):
+                                    os.remove(certificate_path)
+                                failure = run_case(
+                                        program, algorithm, instance_path,
+                                        certificate_path, args.time_limit)
+                                name = (f"{program}/{algorithm}/"
+                                        f"{os.path.basename(instance_path)}")
+                                if failure is None:
+                                    print(f"{name:<80}ok")
+                                else:
+                                    number_of_failures += 1
+                                    print(f"{name:<80}FAILED: {failure}")
+
+    if number_of_failures > 0:
+        print(f"\n{number_of_failures} failure(s).")
+        sys.exit(1)